@@ -2,35 +2,132 @@
 
 import sys
 import os
-from PyQt5.QtWidgets import QApplication
-
-try:
-    # Ensure the package directory is in the Python path
-    package_dir = os.path.dirname(os.path.abspath(__file__))
-    if package_dir not in sys.path:
-        sys.path.insert(0, package_dir)
-    
-    # Import the GUI class
-    from src.gui import CapacitanceCalculatorGUI
-except ImportError as e:
-    print(f"Error importing required modules: {e}")
-    print("Please ensure all required packages are installed and the file structure is correct.")
-    sys.exit(1)
-
-def main():
+import argparse
+
+# Ensure the package directory is in the Python path
+package_dir = os.path.dirname(os.path.abspath(__file__))
+if package_dir not in sys.path:
+    sys.path.insert(0, package_dir)
+
+def run_gui(argv):
+    # Qt and matplotlib are only imported when the GUI is requested
+    try:
+        from PyQt5.QtWidgets import QApplication
+        from src.gui import CapacitanceCalculatorGUI
+    except ImportError as e:
+        print(f"Error importing required modules: {e}")
+        print("Please ensure all required packages are installed and the file structure is correct.")
+        return 1
+
     try:
         # Create the QApplication instance
-        app = QApplication(sys.argv)
-        
+        app = QApplication(argv)
+
         # Create and show the main window
         window = CapacitanceCalculatorGUI()
         window.show()
-        
+
         # Start the event loop
         return app.exec_()
     except Exception as e:
         print(f"Error starting application: {e}")
         return 1
 
+def run_batch(args):
+    # Headless mode: only NumPy/SciPy and the physics modules are loaded
+    from src.batch import run_jobs
+
+    try:
+        n = run_jobs(args.jobs, args.out, n_workers=args.workers)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Error running jobs: {e}", file=sys.stderr)
+        return 1
+    print(f"Wrote {n} results to {args.out}")
+    return 0
+
+def run_benchmark(args):
+    from src.benchmark import run_benchmarks, save_results, load_results, compare, format_table
+
+    records = run_benchmarks(full=args.full)
+    print(format_table(records))
+    print(f"Results written to {save_results(records, args.out)}")
+    if args.baseline is None:
+        return 0
+
+    regressions = compare(records, load_results(args.baseline), max_slowdown=args.max_slowdown)
+    for message in regressions:
+        print(f"REGRESSION {message}")
+    return 1 if regressions else 0
+
+def run_tolerance(args):
+    import json
+    from src.tolerance import run_tolerance_analysis, format_report
+
+    try:
+        with open(args.spec) as f:
+            spec = json.load(f)
+        result = run_tolerance_analysis(**spec, n_workers=args.workers)
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        print(f"Error running tolerance analysis: {e}", file=sys.stderr)
+        return 1
+    print(format_report(result))
+    return 0
+
+def run_server(args):
+    from src.service import run_service
+
+    run_service(args.host, args.port, n_workers=args.workers, window=args.window / 1000,
+                persistent_cache=args.persistent_cache)
+    return 0
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Plate capacitance calculator")
+    commands = parser.add_subparsers(dest='command')
+
+    commands.add_parser('gui', help="Start the graphical interface (default); further arguments go to Qt")
+
+    run = commands.add_parser('run', help="Evaluate a JSON file of jobs without a display")
+    run.add_argument('jobs', help="JSON file with the job specifications")
+    run.add_argument('--out', required=True, help="Results file, .csv or .npz, or a resumable result store directory")
+    run.add_argument('--workers', type=int, default=None, help="Number of worker processes")
+
+    bench = commands.add_parser('bench', help="Time every shape/boundary path and check its accuracy")
+    bench.add_argument('--out', default=None, help="JSON results file, defaults to output/benchmarks/")
+    bench.add_argument('--baseline', default=None, help="Earlier results file to check for regressions")
+    bench.add_argument('--max-slowdown', type=float, default=1.5, help="Allowed per-point slowdown ratio")
+    bench.add_argument('--full', action='store_true', help="Include the slow rectangular dblquad path")
+
+    tolerance = commands.add_parser('tolerance', help="Monte Carlo yield analysis of manufacturing tolerances")
+    tolerance.add_argument('spec', help="JSON file with the run_tolerance_analysis arguments")
+    tolerance.add_argument('--workers', type=int, default=None, help="Number of worker processes")
+
+    serve = commands.add_parser('serve', help="Run the shared local calculation service")
+    serve.add_argument('--host', default='127.0.0.1', help="Address to listen on")
+    serve.add_argument('--port', type=int, default=8750, help="Port to listen on")
+    serve.add_argument('--workers', type=int, default=None,
+                       help="Number of worker processes, 0 to compute in the service process")
+    serve.add_argument('--window', type=float, default=2.0, help="Batching window (ms)")
+    serve.add_argument('--persistent-cache', action='store_true', help="Keep results in output/capacitance_cache.sqlite")
+    return parser
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else list(argv)
+    if argv and argv[0] not in ('-h', '--help') and argv[0].startswith('-'):
+        # No command: the arguments are Qt options for the GUI (e.g. -style fusion)
+        return run_gui(sys.argv[:1] + argv)
+    parser = build_parser()
+    args, qt_args = parser.parse_known_args(argv)
+    if qt_args and args.command != 'gui':
+        parser.error(f"unrecognized arguments: {' '.join(qt_args)}")
+    if args.command == 'run':
+        return run_batch(args)
+    if args.command == 'bench':
+        return run_benchmark(args)
+    if args.command == 'tolerance':
+        return run_tolerance(args)
+    if args.command == 'serve':
+        return run_server(args)
+    return run_gui(sys.argv[:1] + qt_args)
+
 if __name__ == "__main__":
-    sys.exit(main())
\ No newline at end of file
+    sys.exit(main())
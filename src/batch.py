@@ -0,0 +1,75 @@
+import csv
+import json
+
+import numpy as np
+from .explorer import DESIGN_COLUMNS, design_grid, design_table, explore, explore_to_store
+
+def _expand_pressures(P):
+    """
+    Expands a pressure spec: a number, a list, or {"min": ..., "max": ..., "points": ...}.
+    """
+    if isinstance(P, dict):
+        return np.linspace(float(P['min']), float(P['max']), int(P['points']))
+    return np.atleast_1d(np.asarray(P, dtype=float))
+
+def load_jobs(path):
+    """
+    Reads job specifications from a JSON file into one columnar design table.
+
+    The file holds a list of jobs, or an object with a "jobs" list and/or a "grid" of
+    design axes (see explorer.design_grid). Each job has the keys of DESIGN_COLUMNS;
+    its P may be a number, a list or a {"min", "max", "points"} range.
+
+    Parameters:
+    - path: Path of the JSON file
+
+    Returns:
+    - Dictionary mapping each name in DESIGN_COLUMNS to a NumPy array
+    """
+    with open(path) as f:
+        spec = json.load(f)
+    if isinstance(spec, list):
+        spec = {'jobs': spec}
+
+    tables = []
+    for job in spec.get('jobs', []):
+        pressures = _expand_pressures(job['P'])
+        tables.append(design_table(dict(job, P=p) for p in pressures))
+    if 'grid' in spec:
+        grid = dict(spec['grid'])
+        grid['P'] = _expand_pressures(grid['P'])
+        tables.append(design_grid(**grid))
+    if not tables:
+        raise ValueError(f"No jobs found in {path}")
+    return {name: np.concatenate([table[name] for table in tables]) for name in DESIGN_COLUMNS}
+
+def write_results(results, path):
+    """
+    Writes a columnar result table to a .csv or .npz file.
+    """
+    if path.endswith('.npz'):
+        np.savez(path, **results)
+    elif path.endswith('.csv'):
+        columns = list(results)
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(columns)
+            writer.writerows(zip(*(results[name].tolist() for name in columns)))
+    else:
+        raise ValueError("Output file must end in .csv or .npz")
+
+def run_jobs(jobs_path, out_path, n_workers=None):
+    """
+    Loads the jobs in jobs_path, evaluates them and writes the results to out_path.
+
+    An out_path without a .csv or .npz extension is a result store directory (see
+    results_store), written chunk by chunk; running the same jobs again resumes it.
+
+    Returns:
+    - Number of design points evaluated
+    """
+    if not out_path.endswith(('.csv', '.npz')):
+        return len(explore_to_store(load_jobs(jobs_path), out_path, n_workers=n_workers))
+    results = explore(load_jobs(jobs_path), n_workers=n_workers)
+    write_results(results, out_path)
+    return len(results['capacitance'])
@@ -0,0 +1,196 @@
+import json
+import platform
+import time
+
+import numpy as np
+from .capacitance import (calculate_capacitance, calculate_capacitance_circular, calculate_capacitance_rectangular,
+                          calculate_capacitance_sweep, calculate_flexural_rigidity, capacitance_factor, epsilon_0,
+                          _plate_area)
+from .deflections import circular_max_deflection, rectangular_max_deflection
+from .explorer import design_grid, explore
+from .materials import Material
+from .utils import output_path
+
+PATHS = [
+    ('circular', 'simply_supported'),
+    ('circular', 'clamped'),
+    ('rectangular', 'simply_supported'),
+    ('rectangular', 'clamped'),
+]
+
+# Representative geometries; P_max is chosen per path so the plate deflects by the given
+# fraction of the gap, which keeps the cases comparable across boundary conditions
+GEOMETRIES = {
+    'small_deflection': dict(material_name='Steel', thickness=2e-5, a=1e-3, b=1e-3, d0=1e-6, fraction=0.05),
+    'large_deflection': dict(material_name='Aluminum', thickness=1e-5, a=1e-3, b=2e-3, d0=1e-6, fraction=0.5),
+    'thin_gap': dict(material_name='Glass', thickness=5e-6, a=5e-4, b=5e-4, d0=2e-7, fraction=0.3),
+}
+
+# Gauss-Legendre order of the grid reference for the rectangular dblquad path (accurate to about 1e-7)
+REFERENCE_ORDER = 1024
+
+# Number of pressures in the sweep benchmark and of reference points checked along it;
+# rectangular references are adaptive dblquad integrals of several seconds each
+SWEEP_POINTS = 1000
+REFERENCE_POINTS = {'circular': 9, 'rectangular': 3}
+
+# Regression thresholds: allowed slowdown ratio, and allowed growth of the relative error
+MAX_SLOWDOWN = 1.5
+MAX_ERROR_GROWTH = 10.0
+ERROR_FLOOR = 1e-12
+
+def _case(shape, boundary_condition, geometry):
+    """
+    Returns the design arguments and pressure range of one benchmark case.
+    """
+    params = dict(GEOMETRIES[geometry])
+    fraction = params.pop('fraction')
+    b = params.pop('b') if shape == 'rectangular' else None
+    material = Material.get_material(params['material_name'])
+    D = calculate_flexural_rigidity(material.young_mod, material.poisson_rat, params['thickness'])
+
+    # Pressure at which the capped maximum deflection reaches fraction * d0
+    max_deflection = circular_max_deflection if shape == 'circular' else rectangular_max_deflection
+    p_max = fraction * params['d0'] / max_deflection(boundary_condition, 1.0, D, params['a'])
+    return dict(params, b=b), p_max
+
+def reference_capacitance(shape, boundary_condition, pressures, material_name, thickness, a, b, d0, method=None):
+    """
+    High-accuracy reference, computed independently of the batched paths under test.
+
+    Circular plates use adaptive quadrature along r rather than the closed form, and
+    rectangular plates use dblquad rather than the Gauss-Legendre grid. method='grid'
+    evaluates a rectangular plate on a grid of order REFERENCE_ORDER instead, which checks
+    the single-point dblquad path against the series by other means.
+    """
+    pressures = np.asarray(pressures, dtype=float)
+    if method == 'grid':
+        material = Material.get_material(material_name)
+        D = calculate_flexural_rigidity(material.young_mod, material.poisson_rat, thickness)
+        lam = pressures * a**4 / (D * d0)
+        factor = np.asarray(capacitance_factor(shape, boundary_condition, lam, n_quad=REFERENCE_ORDER))
+        return material.dielectric_K * epsilon_0 * _plate_area(shape, a, b) / d0 * factor
+    if shape == 'circular':
+        values = [calculate_capacitance_circular(shape, boundary_condition, P, material_name, thickness, a, d0,
+                                                 method='radial') for P in pressures.ravel()]
+    else:
+        values = [calculate_capacitance_rectangular(shape, boundary_condition, P, material_name, thickness, a, b, d0)
+                  for P in pressures.ravel()]
+    return np.reshape(values, pressures.shape)
+
+def _best_time(func, repeat):
+    best = np.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+def _relative_error(values, reference):
+    return float(np.max(np.abs(np.asarray(values) / reference - 1)))
+
+def run_benchmarks(geometries=None, full=False, repeat=3, batch_size=10000):
+    """
+    Times and checks the accuracy of every shape/boundary path.
+
+    For each path and geometry three modes are measured: a single-point
+    calculate_capacitance call, a SWEEP_POINTS-point calculate_capacitance_sweep and an
+    explorer batch of about batch_size designs. Caching is disabled throughout. Accuracy
+    is checked against reference_capacitance. The rectangular single-point path is an
+    adaptive dblquad taking seconds, so it only runs with full=True.
+
+    Returns:
+    - List of result records (dictionaries)
+    """
+    records = []
+    for shape, boundary_condition in PATHS:
+        for geometry in geometries or GEOMETRIES:
+            design, p_max = _case(shape, boundary_condition, geometry)
+            base = dict(shape=shape, boundary_condition=boundary_condition, geometry=geometry)
+
+            if shape == 'circular' or full:
+                P = 0.5 * p_max
+                seconds, value = _best_time(
+                    lambda: calculate_capacitance(shape, boundary_condition, P, use_cache=False, **design),
+                    1 if shape == 'rectangular' else repeat)
+                reference = reference_capacitance(shape, boundary_condition, P, **design,
+                                                  method='grid' if shape == 'rectangular' else None)
+                records.append(dict(base, mode='single', points=1, seconds=seconds, per_point=seconds,
+                                    rel_error=_relative_error(value, reference)))
+
+            pressures = np.linspace(0, p_max, SWEEP_POINTS)
+            seconds, values = _best_time(
+                lambda: calculate_capacitance_sweep(shape, boundary_condition, pressures, use_cache=False,
+                                                    **design), repeat)
+            check = np.linspace(0, SWEEP_POINTS - 1, REFERENCE_POINTS[shape]).astype(int)
+            reference = reference_capacitance(shape, boundary_condition, pressures[check], **design)
+            records.append(dict(base, mode='sweep', points=SWEEP_POINTS, seconds=seconds,
+                                per_point=seconds / SWEEP_POINTS,
+                                rel_error=_relative_error(values[check], reference)))
+
+            # Batch: a grid of designs around the case, each with a short pressure sweep
+            n_side = max(1, int(round((batch_size / 10) ** (1 / 3))))
+            scale = np.linspace(0.9, 1.1, n_side)
+            grid = design_grid(shape, boundary_condition, design['material_name'], design['thickness'] * scale,
+                               design['a'] * scale, design['d0'] * scale, np.linspace(0, 0.5 * p_max, 10),
+                               b=design['b'])
+            n = len(grid['P'])
+            seconds, _ = _best_time(lambda: explore(grid, n_workers=1, use_cache=False), 1)
+            records.append(dict(base, mode='batch', points=n, seconds=seconds, per_point=seconds / n,
+                                rel_error=None))
+    return records
+
+def save_results(records, path=None):
+    """
+    Writes benchmark records as JSON, by default to output/benchmarks/benchmark-<timestamp>.json.
+
+    Returns:
+    - The path written
+    """
+    path = path or output_path('benchmarks', time.strftime('benchmark-%Y%m%d-%H%M%S.json'))
+    report = {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'machine': platform.machine(),
+        'records': records,
+    }
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=2)
+    return path
+
+def load_results(path):
+    with open(path) as f:
+        return json.load(f)['records']
+
+def compare(records, baseline, max_slowdown=MAX_SLOWDOWN, max_error_growth=MAX_ERROR_GROWTH):
+    """
+    Flags records that are slower or less accurate than the matching baseline record.
+
+    Returns:
+    - List of human-readable regression messages, empty when the run passes
+    """
+    key = lambda record: (record['shape'], record['boundary_condition'], record['geometry'], record['mode'])
+    previous = {key(record): record for record in baseline}
+    regressions = []
+    for record in records:
+        old = previous.get(key(record))
+        if old is None:
+            continue
+        name = '/'.join(key(record))
+        ratio = record['per_point'] / old['per_point']
+        if ratio > max_slowdown:
+            regressions.append(f"{name}: {ratio:.2f}x slower ({old['per_point']:.3g} s -> {record['per_point']:.3g} s per point)")
+        if record['rel_error'] is not None and old['rel_error'] is not None:
+            allowed = max(old['rel_error'], ERROR_FLOOR) * max_error_growth
+            if record['rel_error'] > allowed:
+                regressions.append(f"{name}: relative error grew from {old['rel_error']:.2e} to {record['rel_error']:.2e}")
+    return regressions
+
+def format_table(records):
+    lines = [f"{'path':<30} {'geometry':<17} {'mode':<7} {'points':>7} {'per point (s)':>14} {'rel. error':>11}"]
+    for r in records:
+        error = '-' if r['rel_error'] is None else f"{r['rel_error']:.2e}"
+        lines.append(f"{r['shape'] + '/' + r['boundary_condition']:<30} {r['geometry']:<17} {r['mode']:<7} "
+                     f"{r['points']:>7} {r['per_point']:>14.3e} {error:>11}")
+    return '\n'.join(lines)
@@ -1,4 +1,8 @@
+import math
+from functools import lru_cache
+
 import numpy as np
+from . import profiling
 
 # Define the deflection function for a simply supported circular plate
 def deflection_circular_simply_supported(r, P, D, a):
@@ -12,7 +16,7 @@ def deflection_circular_simply_supported(r, P, D, a):
     deflection = w_max * (1 - (r**2 / a**2))
     
     # Ensure that deflection does not exceed w_max
-    return min(deflection, w_max)
+    return np.minimum(deflection, w_max)
 
 # Define the deflection function for a clamped circular plate
 def deflection_circular_clamped(r, P, D, a):
@@ -26,50 +30,259 @@ def deflection_circular_clamped(r, P, D, a):
     deflection = w_max * (1 - (r**2 / a**2))
     
     # Ensure that deflection does not exceed w_max
-    return min(deflection, w_max)
+    return np.minimum(deflection, w_max)
+
+# Both circular profiles are w(r) = w_max * (1 - r^2 / a^2) with w_max = P * a^4 / (k * D)
+CIRCULAR_WMAX_DIVISOR = {
+    'simply_supported': 64,
+    'clamped': 32,
+}
+
+def circular_max_deflection(boundary_condition, P, D, a):
+    """
+    Returns the centre (maximum) deflection of the parabolic circular profile.
+    """
+    if boundary_condition not in CIRCULAR_WMAX_DIVISOR:
+        raise ValueError("Invalid boundary condition for circular plate")
+    return (P * a**4) / (CIRCULAR_WMAX_DIVISOR[boundary_condition] * D)
+
+# Default number of (m, n) series terms kept for each rectangular boundary condition
+RECTANGULAR_DEFAULT_MODES = {
+    'simply_supported': (4, 4),
+    'clamped': (4, 50),
+}
+
+# Modal amplitudes are W_mn = P * a^4 / (k * D * (m^2 + n^2)), with k given below
+_RECTANGULAR_MODE_DIVISOR = {
+    'simply_supported': 1,
+    'clamped': 4,
+}
+
+# Maximum deflection is w_max = P * a^4 / (k * D), with k given below
+_RECTANGULAR_WMAX_DIVISOR = {
+    'simply_supported': 64,
+    'clamped': 32,
+}
+
+def _check_rectangular_boundary(boundary_condition):
+    if boundary_condition not in RECTANGULAR_DEFAULT_MODES:
+        raise ValueError("Invalid boundary condition for rectangular plate")
+
+def rectangular_modes(boundary_condition, modes=None):
+    """
+    Returns the (m, n) number of series terms to keep for a rectangular plate.
+
+    Parameters:
+    - boundary_condition: 'simply_supported' or 'clamped'
+    - modes: Optional (m, n) tuple overriding the default truncation
+
+    Returns:
+    - Tuple (n_m, n_n) of positive integers
+    """
+    _check_rectangular_boundary(boundary_condition)
+    if modes is None:
+        return RECTANGULAR_DEFAULT_MODES[boundary_condition]
+    n_m, n_n = (int(k) for k in modes)
+    if n_m < 1 or n_n < 1:
+        raise ValueError("Number of modes must be at least 1 in each direction")
+    return n_m, n_n
+
+def rectangular_mode_amplitudes(boundary_condition, D, a, modes=None):
+    """
+    Returns the matrix of modal amplitudes W_mn for a unit pressure.
+
+    Parameters:
+    - boundary_condition: 'simply_supported' or 'clamped'
+    - D: Flexural rigidity (N*m)
+    - a: Length of the rectangular plate (m)
+    - modes: Optional (m, n) tuple overriding the default truncation
+
+    Returns:
+    - Array of shape (n_m, n_n); entry [m-1, n-1] multiplies sin(m*pi*x/a) * sin(n*pi*y/b)
+    """
+    return (a**4 / D) * _unit_mode_amplitudes(boundary_condition, rectangular_modes(boundary_condition, modes))
+
+@lru_cache(maxsize=None)
+def _unit_mode_amplitudes(boundary_condition, modes):
+    n_m, n_n = modes
+    m = np.arange(1, n_m + 1)[:, None]
+    n = np.arange(1, n_n + 1)[None, :]
+    k = _RECTANGULAR_MODE_DIVISOR[boundary_condition]
+    amplitudes = 1 / (k * (m**2 + n**2))
+    amplitudes.flags.writeable = False
+    return amplitudes
+
+def rectangular_max_deflection(boundary_condition, P, D, a):
+    """
+    Returns the maximum deflection used to cap the rectangular series.
+    """
+    _check_rectangular_boundary(boundary_condition)
+    return (P * a**4) / (_RECTANGULAR_WMAX_DIVISOR[boundary_condition] * D)
+
+def sine_table(n_modes, coords, length):
+    """
+    Precomputes sin(k * pi * coords / length) for k = 1..n_modes.
+
+    Parameters:
+    - n_modes: Number of modes
+    - coords: Array of coordinates (m)
+    - length: Plate dimension along that coordinate (m)
+
+    Returns:
+    - Array of shape (n_modes,) + coords.shape
+    """
+    coords = np.asarray(coords, dtype=float)
+    k = np.arange(1, n_modes + 1).reshape((n_modes,) + (1,) * coords.ndim)
+    return np.sin(k * (np.pi / length) * coords)
+
+def deflection_rectangular_grid(x, y, P, D, a, b, boundary_condition, modes=None):
+    """
+    Returns the deflection of a rectangular plate on the tensor grid x by y.
+
+    The modal sum is evaluated as the matrix product Sx^T @ W @ Sy of the two
+    sine tables and the modal amplitude matrix, once for a unit pressure, and is
+    then scaled by every pressure in P.
+
+    Parameters:
+    - x: 1-D array of x coordinates (m)
+    - y: 1-D array of y coordinates (m)
+    - P: Applied pressure (Pa), scalar or array
+    - D: Flexural rigidity (N*m)
+    - a: Length of the rectangular plate (m)
+    - b: Width of the rectangular plate (m)
+    - boundary_condition: 'simply_supported' or 'clamped'
+    - modes: Optional (m, n) tuple overriding the default truncation
+
+    Returns:
+    - Array of shape np.shape(P) + (len(x), len(y))
+    """
+    amplitudes = rectangular_mode_amplitudes(boundary_condition, D, a, modes)
+    n_m, n_n = amplitudes.shape
+    sx = sine_table(n_m, np.ravel(x), a)
+    sy = sine_table(n_n, np.ravel(y), b)
+    unit = sx.T @ amplitudes @ sy
+    if profiling.enabled:
+        profiling.count('deflections.series_terms', n_m * n_n * unit.size)
+
+    P = np.asarray(P, dtype=float)[..., None, None]
+    w_max = rectangular_max_deflection(boundary_condition, P, D, a)
+    return np.minimum(P * unit, w_max)
+
+def deflection_rectangular_points(x, y, P, D, a, b, boundary_condition, modes=None):
+    """
+    Returns the deflection of a rectangular plate at arbitrary points (x, y).
+
+    Parameters:
+    - x, y: Coordinates (m); arrays are broadcast against each other
+    - P: Applied pressure (Pa), scalar or array broadcastable with the points
+    - D: Flexural rigidity (N*m)
+    - a: Length of the rectangular plate (m)
+    - b: Width of the rectangular plate (m)
+    - boundary_condition: 'simply_supported' or 'clamped'
+    - modes: Optional (m, n) tuple overriding the default truncation
+
+    Returns:
+    - Array of deflections with the broadcast shape of x, y and P
+    """
+    amplitudes = rectangular_mode_amplitudes(boundary_condition, D, a, modes)
+    n_m, n_n = amplitudes.shape
+    x, y = np.broadcast_arrays(np.asarray(x, dtype=float), np.asarray(y, dtype=float))
+    sx = np.moveaxis(sine_table(n_m, x, a), 0, -1)
+    sy = np.moveaxis(sine_table(n_n, y, b), 0, -1)
+    unit = np.einsum('...m,mn,...n->...', sx, amplitudes, sy)
+    if profiling.enabled:
+        profiling.count('deflections.series_terms', n_m * n_n * max(unit.size, 1))
+
+    P = np.asarray(P, dtype=float)
+    w_max = rectangular_max_deflection(boundary_condition, P, D, a)
+    return np.minimum(P * unit, w_max)
+
+def rectangular_point_function(P, D, a, b, boundary_condition, modes=None):
+    """
+    Returns a scalar deflection function w(x, y) for a single pressure, for adaptive integrators.
+
+    The modal amplitudes are scaled by P once, and the sum over n is kept for the last
+    y seen: dblquad evaluates the inner x integral at a fixed y, so each call then only
+    costs n_m sines in plain Python instead of an array pass.
+
+    Parameters:
+    - P: Applied pressure (Pa), scalar
+    - D: Flexural rigidity (N*m)
+    - a: Length of the rectangular plate (m)
+    - b: Width of the rectangular plate (m)
+    - boundary_condition: 'simply_supported' or 'clamped'
+    - modes: Optional (m, n) tuple overriding the default truncation
+
+    Returns:
+    - Function of scalar coordinates (x, y) returning the deflection as a float
+    """
+    amplitudes = P * rectangular_mode_amplitudes(boundary_condition, D, a, modes)
+    n_m, n_n = amplitudes.shape
+    w_max = float(rectangular_max_deflection(boundary_condition, P, D, a))
+    kx = [m * math.pi / a for m in range(1, n_m + 1)]
+    ky = np.arange(1, n_n + 1) * (np.pi / b)
+    last = [None, None]  # last y and the coefficients of sin(m*pi*x/a) there
+
+    def deflection(x, y):
+        if y != last[0]:
+            last[1] = (amplitudes @ np.sin(ky * y)).tolist()
+            last[0] = y
+        if profiling.enabled:
+            profiling.count('deflections.series_terms', n_m * n_n)
+        return min(sum(c * math.sin(k * x) for c, k in zip(last[1], kx)), w_max)
+    return deflection
+
+def _deflection_rectangular(x, y, P, D, a, b, boundary_condition, modes):
+    """
+    Deflection at (x, y): a float for scalar inputs, else an array as in deflection_rectangular_points.
+    """
+    if np.ndim(x) == np.ndim(y) == np.ndim(P) == 0:
+        # Plain sines for one point; the array engine's broadcasting costs more than the sum itself
+        amplitudes = rectangular_mode_amplitudes(boundary_condition, D, a, modes)
+        n_m, n_n = amplitudes.shape
+        sx = np.sin(np.arange(1, n_m + 1) * (math.pi * x / a))
+        sy = np.sin(np.arange(1, n_n + 1) * (math.pi * y / b))
+        if profiling.enabled:
+            profiling.count('deflections.series_terms', n_m * n_n)
+        return min(P * float(sx @ amplitudes @ sy), float(rectangular_max_deflection(boundary_condition, P, D, a)))
+    return deflection_rectangular_points(x, y, P, D, a, b, boundary_condition, modes)
 
 # Define the deflection function for a simply supported rectangular plate
-def deflection_rectangular_simply_supported(x, y, P, D, a, b):
+def deflection_rectangular_simply_supported(x, y, P, D, a, b, modes=None):
     """
     Returns the deflection of a simply supported rectangular plate at coordinates (x, y).
     """
-    # For simplification, assume a summation of modes for simply supported plate
-    deflection = 0
-    for m in range(1, 5):  # First few terms for approximation
-        for n in range(1, 5):
-            W_mn = (P * a**4) / (D * (m**2 + n**2))
-            deflection += W_mn * np.sin(m * np.pi * x / a) * np.sin(n * np.pi * y / b)
-    
-    # Calculate maximum deflection
-    w_max = (P * a**4) / (64 * D)
-    
-    # Ensure that deflection does not exceed w_max
-    return min(deflection, w_max)
+    # Summation of the first 4 x 4 modes unless overridden
+    return _deflection_rectangular(x, y, P, D, a, b, 'simply_supported', modes)
 
 # Define the deflection function for a clamped rectangular plate
-def deflection_rectangular_clamped(x, y, P, D, a, b):
+def deflection_rectangular_clamped(x, y, P, D, a, b, modes=None):
     """
     Returns the deflection of a clamped rectangular plate at coordinates (x, y).
     """
-    # For simplification, assume a summation of modes for clamped plate
-    deflection = 0
-    for m in range(1, 5):  # First few terms for approximation
-        for n in range(1, 51):
-            W_mn = (P * a**4) / (4 * D * (m**2 + n**2))
-            deflection += W_mn * np.sin(m * np.pi * x / a) * np.sin(n * np.pi * y / b)
-    
-    # Calculate maximum deflection
-    w_max = (P * a**4) / (32 * D)
-    
-    # Ensure that deflection does not exceed w_max
-    return min(deflection, w_max)
+    # Summation of the first 4 x 50 modes unless overridden
+    return _deflection_rectangular(x, y, P, D, a, b, 'clamped', modes)
 
 # Main function to select the deflection function based on shape and boundary condition
-def get_deflection_function(shape, boundary_condition, P, D, a, b=None):
+@profiling.profiled('get_deflection_function')
+def get_deflection_function(shape, boundary_condition, P, D, a, b=None, modes=None, vectorized=False,
+                            geometry=None):
     """
-    Given the shape (circular or rectangular) and boundary condition (simply_supported or clamped),
+    Given the shape (circular, rectangular or custom) and boundary condition (simply_supported or clamped),
     return the corresponding deflection function that can be integrated for capacitance calculation.
+
+    modes optionally overrides the (m, n) truncation of the rectangular series. With
+    vectorized=True the returned function accepts coordinate arrays (and P may be an array
+    broadcastable with them) and evaluates every point in one NumPy pass. Custom shapes
+    take a PlateGeometry (see fd_plate) and are solved by finite differences; their
+    deflection function f(x, y) is always vectorized and a, b are ignored.
     """
+    if shape == 'custom':
+        from .fd_plate import deflection_fd_points
+        if geometry is None:
+            raise ValueError("A PlateGeometry must be specified for custom plates")
+        return lambda x, y: deflection_fd_points(x, y, P, D, geometry, boundary_condition)
+
     if shape == 'circular':
         if boundary_condition == 'simply_supported':
             return lambda r: deflection_circular_simply_supported(r, P, D, a)
@@ -79,13 +292,13 @@ def get_deflection_function(shape, boundary_condition, P, D, a, b=None):
             raise ValueError("Invalid boundary condition for circular plate")
     
     elif shape == 'rectangular':
-        if boundary_condition == 'simply_supported':
-            return lambda x, y: deflection_rectangular_simply_supported(x, y, P, D, a, b)
-        elif boundary_condition == 'clamped':
-            return lambda x, y: deflection_rectangular_clamped(x, y, P, D, a, b)
+        if vectorized:
+            _check_rectangular_boundary(boundary_condition)
+            return lambda x, y: deflection_rectangular_points(x, y, P, D, a, b, boundary_condition, modes)
+        if boundary_condition in ('simply_supported', 'clamped'):
+            return rectangular_point_function(P, D, a, b, boundary_condition, modes)
         else:
             raise ValueError("Invalid boundary condition for rectangular plate")
     
     else:
-        raise ValueError("Invalid shape type. Choose 'circular' or 'rectangular'")
-
+        raise ValueError("Invalid shape type. Choose 'circular', 'rectangular' or 'custom'")
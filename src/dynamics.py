@@ -0,0 +1,287 @@
+import numpy as np
+from scipy.signal import lfilter, lfilter_zi
+from .capacitance import (calculate_flexural_rigidity, normalized_profile, epsilon_0, _circular_factor,
+                          _gauss_legendre, _plate_area, _validate_design)
+from .deflections import CIRCULAR_WMAX_DIVISOR, rectangular_modes, rectangular_mode_amplitudes, sine_table
+from .materials import Material
+
+# Mass densities (kg/m^3) of the predefined materials; other materials need an explicit density
+DENSITIES = {
+    "Aluminum": 2700.0,
+    "Steel": 7850.0,
+    "Glass": 2500.0,
+    "Test": 2330.0,
+}
+
+# Frequency parameters omega * a^2 * sqrt(rho * h / D) of the circular fundamental mode (nu = 0.3)
+_CIRCULAR_FREQUENCY = {
+    'simply_supported': 4.977,
+    'clamped': 10.2158,
+}
+
+# Clamped rectangular frequencies are the simply supported ones scaled by the ratio of the
+# square-plate fundamentals (35.985 / 2 pi^2), matching the sine modes of the static model
+_CLAMPED_FREQUENCY_RATIO = 35.985 / (2 * np.pi**2)
+
+# Gauss-Legendre nodes per direction of the rectangular capacitance grid; every time step
+# costs one multiply-add per node and dynamic mode, so this is coarser than the static default
+DEFAULT_QUADRATURE_ORDER = 16
+
+# Modes above this fraction of the sample rate are treated quasi-statically
+_MAX_DYNAMIC_FRACTION = 0.45
+
+# Upper bound on the number of (sample, node) pairs evaluated in one NumPy block; a block
+# of 512 KB stays in the L2 cache across the several passes made over it
+_BLOCK_SIZE = 2**16
+
+# Default number of samples per chunk in simulate()
+DEFAULT_CHUNK_SIZE = 2**16
+
+def _density(material_name, density):
+    if density is not None:
+        return float(density)
+    if material_name not in DENSITIES:
+        raise ValueError(f"No density known for material {material_name}; pass density explicitly")
+    return DENSITIES[material_name]
+
+def _modal_model(shape, boundary_condition, a, b, modes):
+    """
+    Modes of the static deflection model.
+
+    Returns:
+    - (alpha, gains, labels): frequency parameters omega * a^2 * sqrt(rho * h / D), static
+      gains per unit load parameter lam = P * a^4 / (D * d0) and (m, n) labels, one per mode
+    """
+    if shape == 'circular':
+        return (np.array([_CIRCULAR_FREQUENCY[boundary_condition]]),
+                np.array([1 / CIRCULAR_WMAX_DIVISOR[boundary_condition]]), [(1, 1)])
+    n_m, n_n = rectangular_modes(boundary_condition, modes)
+    m, n = np.meshgrid(np.arange(1, n_m + 1), np.arange(1, n_n + 1), indexing='ij')
+    alpha = np.pi**2 * (m**2 + n**2 * (a / b)**2)
+    if boundary_condition == 'clamped':
+        alpha = alpha * _CLAMPED_FREQUENCY_RATIO
+    gains = rectangular_mode_amplitudes(boundary_condition, 1.0, 1.0, (n_m, n_n))
+    return alpha.ravel(), gains.ravel(), list(zip(m.ravel().tolist(), n.ravel().tolist()))
+
+def natural_frequencies(shape, boundary_condition, material_name, thickness, a, b=None, density=None, modes=None):
+    """
+    Natural frequencies of the plate modes used by the deflection model.
+
+    Rectangular modes are sin(m pi x / a) * sin(n pi y / b); the simply supported
+    frequencies are exact, clamped ones scale them by the square-plate fundamental ratio.
+    Circular plates have the single parabolic mode of the static model.
+
+    Parameters:
+    - shape: 'circular' or 'rectangular'
+    - boundary_condition: 'simply_supported' or 'clamped'
+    - material_name: Name of the material
+    - thickness: Thickness of the plate (m)
+    - a: Radius (circular) or length (rectangular) of the plate (m)
+    - b: Width of the rectangular plate (m)
+    - density: Mass density (kg/m^3), defaults to the value in DENSITIES
+    - modes: Optional (m, n) number of series terms for rectangular plates
+
+    Returns:
+    - (frequencies, labels): frequencies in Hz sorted ascending and the matching (m, n) labels
+    """
+    _validate_design(shape, boundary_condition, b)
+    if shape == 'custom':
+        raise ValueError("Dynamic analysis supports circular and rectangular plates")
+    material = Material.get_material(material_name)
+    if material is None:
+        raise ValueError(f"Material {material_name} not found!")
+    D = calculate_flexural_rigidity(material.young_mod, material.poisson_rat, thickness)
+    alpha, _, labels = _modal_model(shape, boundary_condition, a, b, modes)
+    omega = alpha / a**2 * np.sqrt(D / (_density(material_name, density) * thickness))
+    order = np.argsort(omega, kind='stable')
+    return omega[order] / (2 * np.pi), [labels[i] for i in order]
+
+def _resonator(omega, damping, gain, sample_rate):
+    """
+    Discrete-time filter of gain * omega^2 / (s^2 + 2 zeta omega s + omega^2).
+
+    Uses the bilinear transform prewarped at omega, so the resonance lands on the
+    right frequency and the DC gain is exact.
+    """
+    c = omega / np.tan(omega / (2 * sample_rate))
+    den = np.array([c**2 + 2 * damping * omega * c + omega**2, 2 * (omega**2 - c**2),
+                    c**2 - 2 * damping * omega * c + omega**2])
+    num = gain * omega**2 * np.array([1.0, 2.0, 1.0])
+    return num / den[0], den / den[0]
+
+class TransientSimulator:
+    """
+    Capacitance waveform C(t) of a plate driven by a pressure waveform P(t).
+
+    Every mode of the static deflection model is a damped oscillator
+    q'' + 2 zeta omega q' + omega^2 q = omega^2 g lam(t), so a constant pressure reproduces
+    the static model exactly. Modes below 0.45 times the sample rate are integrated as
+    second-order IIR filters whose state is carried from chunk to chunk; the higher modes
+    follow the load quasi-statically and are lumped into one residual shape. The node
+    deflections of the dynamic modes and the residual are precomputed, so each time step
+    costs one small matrix product and a weighted sum over the capacitance grid (one scalar
+    closed form for circular plates).
+    """
+    def __init__(self, shape, boundary_condition, material_name, thickness, a, b=None, d0=1e-6, sample_rate=48000.0,
+                 damping=0.01, density=None, modes=None, n_quad=None, max_frequency=None):
+        """
+        Parameters:
+        - shape, boundary_condition, material_name, thickness, a, b, d0: Plate design, as
+          for calculate_capacitance
+        - sample_rate: Sample rate of the pressure waveform (Hz)
+        - damping: Modal damping ratio
+        - density: Mass density (kg/m^3), defaults to the value in DENSITIES
+        - modes: Optional (m, n) number of series terms for rectangular plates
+        - n_quad: Quadrature order of the capacitance grid (default DEFAULT_QUADRATURE_ORDER;
+                  circular plates use the closed form unless this is given)
+        - max_frequency: Modes above this frequency (Hz) are quasi-static; at most 0.45 times
+                         the sample rate
+        """
+        _validate_design(shape, boundary_condition, b)
+        if shape == 'custom':
+            raise ValueError("Dynamic analysis supports circular and rectangular plates")
+        if sample_rate <= 0:
+            raise ValueError("Sample rate must be positive")
+        if damping < 0:
+            raise ValueError("Damping ratio must not be negative")
+        material = Material.get_material(material_name)
+        if material is None:
+            raise ValueError(f"Material {material_name} not found!")
+        D = calculate_flexural_rigidity(material.young_mod, material.poisson_rat, thickness)
+        alpha, gains, labels = _modal_model(shape, boundary_condition, a, b, modes)
+        omega = alpha / a**2 * np.sqrt(D / (_density(material_name, density) * thickness))
+        limit = _MAX_DYNAMIC_FRACTION * sample_rate
+        limit = limit if max_frequency is None else min(limit, max_frequency)
+
+        self.sample_rate = float(sample_rate)
+        self.frequencies = omega / (2 * np.pi)
+        self.labels = labels
+        self.dynamic = self.frequencies <= limit
+        self.beta = a**4 / (D * d0)  # lam = beta * P
+        self.scale = material.dielectric_K * epsilon_0 * _plate_area(shape, a, b) / d0
+        self.d0 = d0
+        self._filters = [_resonator(w, damping, g, sample_rate) for w, g in zip(omega[self.dynamic], gains[self.dynamic])]
+        self._fundamental = np.argmin(omega)
+        self._closed_form = shape == 'circular' and n_quad is None
+
+        if self._closed_form:
+            # One parabolic mode: the deflection relative to the gap is q * (1 - r^2 / a^2)
+            self._centre = np.ones(1)[self.dynamic]
+            self._residual_centre = 0.0 if self.dynamic[0] else gains[0]
+        else:
+            if shape == 'circular':
+                self.weights, profile, self.cap = normalized_profile(shape, boundary_condition, None, n_quad)
+                n = self.weights.size
+                rho, _ = _gauss_legendre(n)
+                shapes = (1 - rho**2)[None, :]
+                centre = np.ones(1)
+            else:
+                n_quad = DEFAULT_QUADRATURE_ORDER if n_quad is None else n_quad
+                n_quad = (int(n_quad), int(n_quad)) if np.ndim(n_quad) == 0 else tuple(int(k) for k in n_quad)
+                self.weights, profile, self.cap = normalized_profile(shape, boundary_condition, modes, n_quad)
+                n_m, n_n = rectangular_modes(boundary_condition, modes)
+                xi, _ = _gauss_legendre(n_quad[0])
+                eta, _ = _gauss_legendre(n_quad[1])
+                sx, sy = sine_table(n_m, xi, 1.0), sine_table(n_n, eta, 1.0)
+                shapes = (sx[:, None, :, None] * sy[None, :, None, :]).reshape(n_m * n_n, -1)
+                centre = (sine_table(n_m, 0.5, 1.0)[:, None] * sine_table(n_n, 0.5, 1.0)[None, :]).ravel()
+            # Node deflections per unit modal coordinate, plus the quasi-static residual per unit lam
+            self._shapes = shapes[self.dynamic]
+            self._residual = profile - gains[self.dynamic] @ self._shapes
+            self._basis = np.vstack([self._shapes, self._residual])
+            self._centre = centre[self.dynamic]
+            self._residual_centre = gains @ centre - gains[self.dynamic] @ self._centre
+        self._fundamental_gain = gains[self._fundamental]
+        self.reset()
+
+    def reset(self, pressure=0.0):
+        """
+        Puts every mode at rest in static equilibrium under pressure.
+        """
+        lam = self.beta * pressure
+        self._state = [lfilter_zi(num, den) * lam for num, den in self._filters]
+
+    def _modal_response(self, lam):
+        """
+        Filters a chunk of loads through every dynamic mode, carrying the filter states.
+        """
+        q = np.empty((len(self._filters), lam.size))
+        for i, (num, den) in enumerate(self._filters):
+            q[i], self._state[i] = lfilter(num, den, lam, zi=self._state[i])
+        return q
+
+    def process(self, pressures):
+        """
+        Simulates the next chunk of the pressure waveform, continuing from the previous one.
+
+        Parameters:
+        - pressures: Pressure samples (Pa)
+
+        Returns:
+        - Dictionary of arrays: 'capacitance' (F, inf once the plate touches down) and
+          'deflection' (centre deflection, m)
+        """
+        pressures = np.asarray(pressures, dtype=float).ravel()
+        lam = self.beta * pressures
+        q = self._modal_response(lam)
+        deflection = self._centre @ q + self._residual_centre * lam
+
+        if self._closed_form:
+            factor = _circular_factor(deflection)
+        else:
+            # The static model caps the deflection at cap * lam; the fundamental mode gives lam
+            if self.dynamic[self._fundamental]:
+                lam_cap = q[np.count_nonzero(self.dynamic[:self._fundamental])] / self._fundamental_gain
+            else:
+                lam_cap = lam
+            # One product gives the node deflections of the dynamic modes and the residual
+            loads = np.vstack([q, lam[None, :]])
+            limits = lam_cap * self.cap
+            factor = np.empty(lam.size)
+            step = max(1, _BLOCK_SIZE // self.weights.size)
+            for start in range(0, lam.size, step):
+                stop = start + step
+                if len(self._filters):
+                    gap = loads[:, start:stop].T @ self._basis
+                else:
+                    # A rank-one product is much slower through BLAS than as a broadcast
+                    gap = np.multiply(lam[start:stop, None], self._residual)
+                np.minimum(gap, limits[start:stop, None], out=gap)
+                np.subtract(1, gap, out=gap)
+                # The deflection never exceeds its cap, so only rows capped at or beyond the gap can touch
+                candidates = np.flatnonzero(limits[start:stop] >= 1)
+                touched = candidates[gap[candidates].min(axis=1) <= 0]
+                factor[start:stop] = np.reciprocal(gap, out=gap) @ self.weights
+                factor[start + touched] = np.inf
+        return dict(capacitance=self.scale * factor, deflection=self.d0 * deflection)
+
+    def stream(self, chunks):
+        """
+        Simulates a waveform given as an iterable of pressure chunks, yielding the result of
+        process() for each chunk; memory is bounded by the chunk size.
+        """
+        for chunk in chunks:
+            yield self.process(chunk)
+
+    def simulate(self, pressures, chunk_size=DEFAULT_CHUNK_SIZE, reset=True):
+        """
+        Simulates a whole pressure waveform in chunks.
+
+        Parameters:
+        - pressures: Pressure samples (Pa)
+        - chunk_size: Samples processed per chunk
+        - reset: Start at rest in equilibrium with the first sample instead of continuing
+
+        Returns:
+        - Dictionary of arrays as returned by process()
+        """
+        pressures = np.asarray(pressures, dtype=float).ravel()
+        if reset:
+            self.reset(pressures[0] if pressures.size else 0.0)
+        capacitance = np.empty(pressures.size)
+        deflection = np.empty(pressures.size)
+        for start in range(0, pressures.size, chunk_size):
+            result = self.process(pressures[start:start + chunk_size])
+            capacitance[start:start + chunk_size] = result['capacitance']
+            deflection[start:start + chunk_size] = result['deflection']
+        return dict(capacitance=capacitance, deflection=deflection)
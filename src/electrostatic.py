@@ -0,0 +1,200 @@
+import numpy as np
+from scipy.optimize import brentq
+from .capacitance import (calculate_flexural_rigidity, normalized_profile, epsilon_0, _plate_area,
+                          _validate_design)
+from .materials import Material
+
+# Newton iterations stop once the step is below this fraction of the load parameter
+_TOLERANCE = 1e-12
+
+# Newton iterations allowed per point; close to pull-in convergence becomes linear
+_MAX_ITERATIONS = 100
+
+# Touch-down is approached no closer than this fraction when bracketing pull-in
+_TOUCHDOWN_MARGIN = 1e-12
+
+class CoupledSolver:
+    """
+    Plate deflection under pressure plus the electrostatic attraction of a bias voltage.
+
+    The deflected plate keeps the linear shape of the pressure-only model, w = lam * d0 * psi
+    with lam = P_eff * a^4 / (D * d0). The electrostatic load K * epsilon_0 * V^2 / (2 * gap^2)
+    is projected onto that shape (one-term Galerkin), which gives the scalar equation
+
+        h(lam) = lam - lam_P - mu * G(lam) = 0,   G(lam) = sum(w psi / (1 - lam psi)^2) / sum(w psi)
+
+    with lam_P the pressure load and mu = K * epsilon_0 * V^2 * a^4 / (2 * D * d0^3). G is
+    convex, so h is concave: Newton iterates started left of the stable root approach it
+    monotonically, and reaching h' <= 0 while h < 0 means there is no root, i.e. pull-in.
+    Pull-in itself is where h = 0 and h' = 0, i.e. lam - lam_P = G / G' and mu = 1 / G'.
+    """
+    def __init__(self, shape, boundary_condition, material_name, thickness, a, b=None, d0=1e-6, modes=None,
+                 n_quad=None, geometry=None):
+        _validate_design(shape, boundary_condition, b, geometry)
+        material = Material.get_material(material_name)
+        if material is None:
+            raise ValueError(f"Material {material_name} not found!")
+        D = calculate_flexural_rigidity(material.young_mod, material.poisson_rat, thickness)
+
+        if shape == 'custom':
+            from .fd_plate import unit_deflection
+            on_plate = geometry.weights > 0
+            self.weights = geometry.weights[on_plate] / geometry.area
+            self.profile = unit_deflection(geometry, boundary_condition)[on_plate]
+            self.cap = np.inf
+            length4 = 1.0
+            area = geometry.area
+        else:
+            self.weights, self.profile, self.cap = normalized_profile(shape, boundary_condition, modes, n_quad)
+            length4 = a**4
+            area = _plate_area(shape, a, b)
+
+        # lam = beta * P and mu = kappa * V^2
+        self.beta = length4 / (D * d0)
+        self.kappa = material.dielectric_K * epsilon_0 * self.beta / (2 * d0**2)
+        self.scale = material.dielectric_K * epsilon_0 * area / d0
+        self.d0 = d0
+        # Deflection shape per unit lam above and below zero load (the cap switches branch)
+        self._shapes = (np.minimum(self.profile, self.cap), np.maximum(self.profile, self.cap)
+                        if np.isfinite(self.cap) else self.profile)
+        self.lam_touchdown = 1 / self._shapes[0].max()
+        self._last = None
+
+    def _evaluate(self, lam):
+        """
+        Returns (F, G, G') at lam; all inf where the plate touches down.
+        """
+        psi = self._shapes[0] if lam >= 0 else self._shapes[1]
+        gap = 1 - lam * psi
+        if gap.min() <= 0:
+            return np.inf, np.inf, np.inf
+        r = 1 / gap
+        wp = self.weights * psi
+        norm = wp.sum()
+        wr2 = wp * r * r
+        return self.weights @ r, wr2.sum() / norm, 2 * (wr2 * psi) @ r / norm
+
+    def _newton(self, lam_p, mu, start):
+        """
+        Newton iterations from start; returns (lam, iterations), lam NaN on pull-in.
+        """
+        lam = start
+        for iteration in range(1, _MAX_ITERATIONS + 1):
+            _, g, dg = self._evaluate(lam)
+            h = lam - lam_p - mu * g
+            dh = 1 - mu * dg
+            if not np.isfinite(h) or dh <= 0:
+                return np.nan, iteration
+            step = h / dh
+            lam -= step
+            if abs(step) <= _TOLERANCE * max(1.0, abs(lam)):
+                return lam, iteration
+        return lam, _MAX_ITERATIONS
+
+    def _starts(self, lam_p, mu):
+        """
+        Starting points in order of preference: the tangent predictor and the previous
+        solution when continuing a path, then the cold start lam_P, which always lies left of
+        the stable root.
+        """
+        if self._last is not None:
+            lam, last_p, last_mu = self._last
+            _, g, dg = self._evaluate(lam)
+            slope = 1 - last_mu * dg
+            if np.isfinite(g) and slope > 0:
+                yield lam + ((lam_p - last_p) + (mu - last_mu) * g) / slope
+            yield lam
+        yield lam_p
+
+    def solve(self, pressures, voltages, continuation=True):
+        """
+        Solves the coupled problem along a path of (pressure, voltage) points.
+
+        Points are solved in order; with continuation each one is warm-started from the
+        previous solution through a tangent predictor, so smooth sweeps converge in a few
+        Newton iterations per point. Successive calls continue from the last point solved.
+
+        Parameters:
+        - pressures: Applied pressures (Pa), broadcast against voltages
+        - voltages: Bias voltages (V)
+        - continuation: Warm-start from the previous point instead of the pressure-only load
+
+        Returns:
+        - Dictionary of arrays: 'capacitance' (F, inf after pull-in), 'deflection' (maximum,
+          m), 'effective_pressure' (Pa), 'iterations' and 'pulled_in'
+        """
+        pressures, voltages = np.broadcast_arrays(np.asarray(pressures, dtype=float),
+                                                  np.asarray(voltages, dtype=float))
+        flat_p, flat_v = pressures.ravel(), voltages.ravel()
+        lam = np.full(flat_p.shape, np.nan)
+        iterations = np.zeros(flat_p.shape, dtype=int)
+        if not continuation:
+            self._last = None
+        for i, (P, V) in enumerate(zip(flat_p.tolist(), flat_v.tolist())):
+            lam_p, mu = self.beta * P, self.kappa * V * V
+            for start in self._starts(lam_p, mu):
+                _, g, dg = self._evaluate(start)
+                # Accept starts left of the maximum of h; the cold start decides pull-in
+                if (np.isfinite(g) and 1 - mu * dg > 0) or start == lam_p:
+                    lam[i], n = self._newton(lam_p, mu, start)
+                    iterations[i] += n
+                    if not np.isnan(lam[i]) or start == lam_p:
+                        break
+            self._last = None if np.isnan(lam[i]) else (lam[i], lam_p, mu)
+            if not continuation:
+                self._last = None
+
+        pulled_in = np.isnan(lam)
+        factor = np.array([np.inf if np.isnan(x) else self._evaluate(x)[0] for x in lam.tolist()])
+        deflection = np.where(pulled_in, self.d0, lam * self.d0 * np.where(lam >= 0, self._shapes[0].max(),
+                                                                          self._shapes[1].min()))
+        shape = pressures.shape
+        return dict(capacitance=(self.scale * factor).reshape(shape), deflection=deflection.reshape(shape),
+                    effective_pressure=(lam / self.beta).reshape(shape), iterations=iterations.reshape(shape),
+                    pulled_in=pulled_in.reshape(shape))
+
+    def pull_in_voltage(self, pressures):
+        """
+        Returns the pull-in voltage (V) at each pressure; 0 at or beyond touch-down.
+        """
+        pressures = np.asarray(pressures, dtype=float)
+        result = np.zeros(pressures.shape)
+        upper = self.lam_touchdown * (1 - _TOUCHDOWN_MARGIN)
+        for i, P in np.ndenumerate(pressures):
+            lam_p = self.beta * P
+            if lam_p >= upper:
+                continue
+            # h = 0 and h' = 0: lam - G / G' = lam_P, which increases monotonically in lam
+            def residual(lam):
+                _, g, dg = self._evaluate(lam)
+                return lam - g / dg - lam_p
+            lower = min(lam_p, 0.0)
+            while residual(lower) > 0:
+                lower = 2 * lower - 1
+            lam = brentq(residual, lower, upper, xtol=_TOLERANCE * self.lam_touchdown)
+            result[i] = np.sqrt(1 / (self.kappa * self._evaluate(lam)[2]))
+        return result if result.ndim else float(result)
+
+    def pull_in_pressure(self, voltages):
+        """
+        Returns the pressure (Pa) at which the plate pulls in under each bias voltage.
+
+        Without bias this is the touch-down pressure; the result is negative when the
+        voltage alone exceeds the pull-in voltage.
+        """
+        voltages = np.asarray(voltages, dtype=float)
+        result = np.empty(voltages.shape)
+        upper = self.lam_touchdown * (1 - _TOUCHDOWN_MARGIN)
+        for i, V in np.ndenumerate(voltages):
+            mu = self.kappa * V * V
+            if mu == 0:
+                result[i] = self.lam_touchdown / self.beta
+                continue
+            # mu * G'(lam) = 1, with G' increasing in lam
+            residual = lambda lam: mu * self._evaluate(lam)[2] - 1
+            lower = 0.0
+            while residual(lower) > 0:
+                lower = 2 * lower - 1
+            lam = brentq(residual, lower, upper, xtol=_TOLERANCE * self.lam_touchdown)
+            result[i] = (lam - mu * self._evaluate(lam)[1]) / self.beta
+        return result if result.ndim else float(result)
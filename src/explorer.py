@@ -0,0 +1,292 @@
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+from .capacitance import calculate_capacitance_sweep, normalized_profile, epsilon_0, _plate_area
+from .materials import Material, registry
+from .results_store import ResultStore, DEFAULT_CHUNK_SIZE, MANIFEST, default_store_path, fingerprint
+
+# Input columns of a design table, in order
+DESIGN_COLUMNS = ('shape', 'boundary_condition', 'material_name', 'thickness', 'a', 'b', 'd0', 'P')
+_TEXT_COLUMNS = ('shape', 'boundary_condition', 'material_name')
+
+# Relative cost of resolving one design (material lookup, rigidity, profile lookup)
+_DESIGN_OVERHEAD = 50.0
+
+# Number of chunks scheduled per worker, so that fast workers pick up the slack
+_CHUNKS_PER_WORKER = 8
+
+# Store chunks queued on the pool ahead of the one being written, so workers never idle
+_STORE_LOOKAHEAD = 2
+
+# Design table and sweep options of the current process, set once per pool worker
+_shared = {}
+
+def _as_table(columns):
+    """
+    Converts a mapping of column name -> values into a columnar table of NumPy arrays.
+    """
+    missing = [name for name in DESIGN_COLUMNS if name not in columns and name != 'b']
+    if missing:
+        raise ValueError(f"Design table is missing columns: {', '.join(missing)}")
+    n = len(columns['P'])
+    table = {}
+    for name in DESIGN_COLUMNS:
+        values = columns.get(name)
+        if name == 'b' and values is None:
+            values = np.full(n, np.nan)
+        if name in _TEXT_COLUMNS:
+            table[name] = np.asarray(values, dtype=str)
+        else:
+            table[name] = np.array(values, dtype=float)
+        if len(table[name]) != n:
+            raise ValueError("All design columns must have the same length")
+    # b is meaningless for circular plates
+    table['b'][table['shape'] == 'circular'] = np.nan
+    return table
+
+def design_grid(shape, boundary_condition, material_name, thickness, a, d0, P, b=None):
+    """
+    Builds the Cartesian product of the given design axes as a columnar table.
+
+    Parameters:
+    - shape, boundary_condition, material_name: A value or a list of values
+    - thickness, a, b, d0, P: A value or a list/array of values (m, Pa)
+
+    Returns:
+    - Dictionary mapping each name in DESIGN_COLUMNS to a NumPy array
+    """
+    axes = dict(shape=shape, boundary_condition=boundary_condition, material_name=material_name,
+                thickness=thickness, a=a, b=b, d0=d0, P=P)
+    axes = {name: np.atleast_1d(np.asarray(values, dtype=object)) for name, values in axes.items()}
+    index = np.indices([len(values) for values in axes.values()]).reshape(len(axes), -1)
+    return _as_table({name: values[i] for (name, values), i in zip(axes.items(), index)})
+
+def design_table(points):
+    """
+    Builds a columnar table from a list of design points.
+
+    Parameters:
+    - points: Iterable of dictionaries with the keys in DESIGN_COLUMNS (b optional)
+
+    Returns:
+    - Dictionary mapping each name in DESIGN_COLUMNS to a NumPy array
+    """
+    points = list(points)
+    return _as_table({name: [point.get(name) for point in points] for name in DESIGN_COLUMNS})
+
+def _estimate_cost(table, group_first, options):
+    """
+    Estimates the relative cost of one pressure point of each design group.
+    """
+    costs = {}
+    per_point = np.empty(len(group_first))
+    for g, row in enumerate(group_first):
+        key = (table['shape'][row], table['boundary_condition'][row])
+        if key not in costs:
+            if key[0] == 'circular':
+                costs[key] = 1.0
+            else:
+                weights, _, _ = normalized_profile(*key, options.get('modes'), options.get('n_quad'))
+                costs[key] = weights.size / 64
+        per_point[g] = costs[key]
+    return per_point
+
+def _schedule(table, n_workers, options):
+    """
+    Orders the rows by design and cuts them into contiguous chunks of similar cost.
+
+    Returns:
+    - (order, group, bounds): row permutation, group id of each ordered row and chunk limits
+    """
+    # NaN never compares equal, so circular plates use b = 0 in the grouping key
+    keys = np.rec.fromarrays([np.nan_to_num(table[name]) if name == 'b' else table[name]
+                              for name in DESIGN_COLUMNS if name != 'P'])
+    _, group_first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+    inverse = inverse.ravel()
+
+    # Most expensive groups first, so the long chunks start early
+    per_point = _estimate_cost(table, group_first, options)
+    rank = np.empty(len(group_first), dtype=int)
+    rank[np.argsort(-per_point, kind='stable')] = np.arange(len(group_first))
+    order = np.argsort(rank[inverse], kind='stable')
+    group = inverse[order]
+
+    cost = per_point[group]
+    cost[np.r_[True, group[1:] != group[:-1]]] += _DESIGN_OVERHEAD
+    cumulative = np.cumsum(cost)
+    n_chunks = max(1, n_workers * _CHUNKS_PER_WORKER)
+    cuts = np.searchsorted(cumulative, cumulative[-1] * np.arange(1, n_chunks) / n_chunks)
+    bounds = np.unique(np.r_[0, cuts, len(order)])
+    return order, group, bounds
+
+def _init_worker(table, group, materials, options):
+    # Materials added at runtime must exist in the worker too
+    for name, properties in materials.items():
+        Material.add_material(name, **properties)
+    _shared.update(table=table, group=group, options=options)
+
+def _evaluate_range(start, stop):
+    """
+    Evaluates the ordered rows start:stop of the shared table, one sweep per design run.
+    """
+    table, group, options = _shared['table'], _shared['group'], _shared['options']
+    result = np.empty(stop - start)
+    breaks = np.flatnonzero(group[start + 1:stop] != group[start:stop - 1]) + 1
+    for lo, hi in zip(np.r_[0, breaks], np.r_[breaks, stop - start]):
+        row = start + lo
+        b = table['b'][row]
+        result[lo:hi] = calculate_capacitance_sweep(
+            table['shape'][row], table['boundary_condition'][row], table['P'][row:start + hi],
+            table['material_name'][row], table['thickness'][row], table['a'][row],
+            None if np.isnan(b) else b, table['d0'][row], **options
+        )
+    return start, result
+
+def _check_materials(table):
+    unknown = set(table['material_name']) - set(Material.list_materials())
+    if unknown:
+        raise ValueError(f"Material {sorted(unknown)[0]} not found!")
+
+def explore(designs, n_workers=None, modes=None, n_quad=None, use_cache=True):
+    """
+    Evaluates the capacitance of every design point, spread over a process pool.
+
+    Rows that differ only in P are evaluated together as one pressure sweep. The table is
+    sorted by design and cut into contiguous chunks of similar estimated cost (rectangular
+    designs are far more expensive than circular ones); each worker receives the table once
+    when it starts, and tasks carry only their row range.
+
+    Parameters:
+    - designs: Columnar table from design_grid/design_table, or a list of design dictionaries
+    - n_workers: Number of worker processes, defaults to the CPU count; 1 runs in-process
+    - modes: Optional (m, n) number of series terms for rectangular plates
+    - n_quad: Optional quadrature order of the sweep grid
+    - use_cache: Use the result cache of each worker process
+
+    Returns:
+    - Columnar table (dictionary of NumPy arrays) with the inputs and a 'capacitance' column
+    """
+    table = design_table(designs) if isinstance(designs, (list, tuple)) else _as_table(designs)
+    n = len(table['P'])
+    if n == 0:
+        return dict(table, capacitance=np.empty(0))
+
+    _check_materials(table)
+    if n_workers is None:
+        n_workers = os.cpu_count() or 1
+    options = dict(modes=modes, n_quad=n_quad, use_cache=use_cache)
+    order, group, bounds = _schedule(table, n_workers, options)
+    ordered = {name: values[order] for name, values in table.items()}
+
+    capacitance = np.empty(n)
+    if n_workers == 1:
+        _init_worker(ordered, group, {}, options)
+        for start, stop in zip(bounds[:-1], bounds[1:]):
+            capacitance[start:stop] = _evaluate_range(start, stop)[1]
+    else:
+        initargs = (ordered, group, dict(Material.PREDEFINED_MATERIALS), options)
+        with ProcessPoolExecutor(n_workers, initializer=_init_worker, initargs=initargs) as pool:
+            futures = [pool.submit(_evaluate_range, int(start), int(stop))
+                       for start, stop in zip(bounds[:-1], bounds[1:])]
+            for future in as_completed(futures):
+                start, values = future.result()
+                capacitance[start:start + len(values)] = values
+
+    # Restore the caller's row order
+    result = dict(table)
+    result['capacitance'] = np.empty(n)
+    result['capacitance'][order] = capacitance
+    return result
+
+def explore_to_store(designs, path=None, chunk_size=DEFAULT_CHUNK_SIZE, n_workers=None, modes=None, n_quad=None,
+                     use_cache=True, resume=True, progress=None):
+    """
+    Evaluates a design table chunk by chunk into a ResultStore on disk.
+
+    Every missing chunk of rows is scheduled like explore() does it, and all of them are
+    streamed through one process pool that receives the table once; each chunk is written
+    as soon as its rows are done, with a couple of chunks queued ahead. Running the same
+    job again on the same path resumes after the last completed chunk.
+
+    Parameters:
+    - designs: Columnar table from design_grid/design_table, or a list of design dictionaries
+    - path: Store directory, defaults to a new directory in output/results/
+    - chunk_size: Rows per chunk
+    - n_workers, modes, n_quad, use_cache: As for explore
+    - resume: Continue an interrupted store of the same job instead of starting over
+    - progress: Optional function called with (rows done, total rows) after every chunk
+
+    Returns:
+    - The ResultStore, with the DESIGN_COLUMNS plus 'capacitance' (F) and 'capacitance_change',
+      the relative change from the unloaded capacitance
+    """
+    table = design_table(designs) if isinstance(designs, (list, tuple)) else _as_table(designs)
+    n = len(table['P'])
+    path = path or default_store_path()
+    job = fingerprint(table)
+    if resume and os.path.exists(os.path.join(path, MANIFEST)):
+        store = ResultStore.open(path)
+        if store.metadata.get('fingerprint') != job or store.chunk_size != chunk_size:
+            raise ValueError(f"The store in {path} belongs to a different job; choose another path or resume=False")
+    else:
+        columns = {name: str if name in _TEXT_COLUMNS else float for name in DESIGN_COLUMNS}
+        columns.update(capacitance=float, capacitance_change=float)
+        store = ResultStore.create(path, columns, chunk_size, n_rows=n, overwrite=True,
+                                   metadata=dict(fingerprint=job, source='explorer'))
+    missing = store.missing_chunks()
+    if not missing:
+        return store
+    _check_materials(table)
+    if n_workers is None:
+        n_workers = os.cpu_count() or 1
+    options = dict(modes=modes, n_quad=n_quad, use_cache=use_cache)
+
+    # Schedule every missing chunk within its own rows; the ordered table and group ids
+    # then cover the whole job, so workers get them once and tasks carry only row ranges
+    order = np.arange(n)
+    group = np.zeros(n, dtype=int)
+    tasks = {}
+    for index in missing:
+        lo, hi = index * chunk_size, min((index + 1) * chunk_size, n)
+        chunk_order, chunk_group, bounds = _schedule({name: values[lo:hi] for name, values in table.items()},
+                                                     n_workers, options)
+        order[lo:hi] = lo + chunk_order
+        group[lo:hi] = chunk_group  # tasks never span chunks, so group ids may repeat across them
+        tasks[index] = [(lo + int(start), lo + int(stop)) for start, stop in zip(bounds[:-1], bounds[1:])]
+    ordered = {name: values[order] for name, values in table.items()}
+
+    def write(index, parts):
+        lo, hi = index * chunk_size, min((index + 1) * chunk_size, n)
+        result = {name: values[lo:hi] for name, values in table.items()}
+        result['capacitance'] = np.empty(hi - lo)
+        for start, values in parts:
+            result['capacitance'][order[start:start + len(values)] - lo] = values
+        # The unloaded plate has C0 = K * epsilon_0 * area / d0
+        K = registry.properties(result['material_name'])['dielectric_K']
+        area = np.where(result['shape'] == 'circular', _plate_area('circular', result['a'], None),
+                        _plate_area('rectangular', result['a'], result['b']))
+        result['capacitance_change'] = result['capacitance'] * result['d0'] / (K * epsilon_0 * area) - 1
+        store.write_chunk(index, result)
+        if progress is not None:
+            progress(len(store), n)
+
+    if n_workers == 1:
+        _init_worker(ordered, group, {}, options)
+        for index in missing:
+            write(index, [_evaluate_range(start, stop) for start, stop in tasks[index]])
+        return store
+
+    initargs = (ordered, group, dict(Material.PREDEFINED_MATERIALS), options)
+    with ProcessPoolExecutor(n_workers, initializer=_init_worker, initargs=initargs) as pool:
+        queued = deque()
+        for index in missing:
+            queued.append((index, [pool.submit(_evaluate_range, start, stop) for start, stop in tasks[index]]))
+            while len(queued) > _STORE_LOOKAHEAD:
+                index, futures = queued.popleft()
+                write(index, [future.result() for future in futures])
+        while queued:
+            index, futures = queued.popleft()
+            write(index, [future.result() for future in futures])
+    return store
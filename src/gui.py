@@ -1,18 +1,105 @@
 import sys
+import threading
 import numpy as np
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, 
                            QHBoxLayout, QComboBox, QLabel, QLineEdit, QPushButton,
-                           QGroupBox, QFormLayout, QMessageBox, QSplitter)
-from PyQt5.QtCore import Qt
+                           QGroupBox, QFormLayout, QMessageBox, QSplitter, QProgressBar, QCheckBox,
+                           QPlainTextEdit, QFileDialog)
+from PyQt5.QtCore import Qt, QObject, QThread, pyqtSignal
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
 from matplotlib.figure import Figure
 import matplotlib.pyplot as plt
 from .materials import Material
-from .capacitance import calculate_capacitance
+from .capacitance import calculate_capacitance_sweep
+from .electrostatic import CoupledSolver
+from .plotting import LivePlot
+from .results_store import ResultStore
+from .utils import OUTPUT_DIR
+from . import profiling
+
+class SweepWorker(QObject):
+    """
+    Computes a pressure sweep off the GUI thread, streaming partial results.
+
+    The pressure array is processed in chunks through calculate_capacitance_sweep; after
+    each chunk the results so far are emitted, and cancel() stops the job before the next one.
+    With exact_sensitivity the sensitivity dC/dP comes from the analytic derivative of the
+    same pass, which bypasses the result cache; otherwise, and for the coupled solve under
+    a bias voltage, the cached capacitances are differentiated numerically.
+    """
+    # Number of partial updates emitted for a sweep
+    N_UPDATES = 20
+
+    progress = pyqtSignal(int, int)  # points done, total points
+    partial = pyqtSignal(object, object, object)  # pressures, capacitances and dC/dP computed so far
+    finished = pyqtSignal()
+    failed = pyqtSignal(str)
+
+    def __init__(self, shape, boundary, material, thickness, a, b, d0, pressures, voltage=0.0,
+                 exact_sensitivity=False):
+        super().__init__()
+        self.args = (shape, boundary)
+        self.kwargs = dict(material_name=material, thickness=thickness, a=a, b=b, d0=d0, voltage=voltage)
+        self.pressures = pressures
+        self.exact_sensitivity = exact_sensitivity
+        self._cancel = threading.Event()
+
+    def cancel(self):
+        self._cancel.set()
+
+    def is_cancelled(self):
+        return self._cancel.is_set()
+
+    def run(self):
+        try:
+            total = len(self.pressures)
+            chunk = max(1, -(-total // self.N_UPDATES))
+            capacitances = np.empty(total)
+            sensitivities = np.empty(total)
+            exact = self.exact_sensitivity and not self.kwargs['voltage']
+            solver = None
+            if self.kwargs['voltage']:
+                # One solver for the whole sweep, so every chunk continues from the last point solved
+                kwargs = dict(self.kwargs)
+                voltage = kwargs.pop('voltage')
+                solver = CoupledSolver(*self.args, **kwargs)
+            for start in range(0, total, chunk):
+                if self.is_cancelled():
+                    break
+                stop = min(start + chunk, total)
+                if exact:
+                    result = calculate_capacitance_sweep(
+                        *self.args, self.pressures[start:stop], return_gradient=True, **self.kwargs
+                    )
+                    capacitances[start:stop], sensitivities[start:stop] = result[0], result[1]['P']
+                elif solver is not None:
+                    capacitances[start:stop] = solver.solve(self.pressures[start:stop], voltage)['capacitance']
+                else:
+                    capacitances[start:stop] = calculate_capacitance_sweep(
+                        *self.args, self.pressures[start:stop], **self.kwargs
+                    )
+                if not exact:
+                    sensitivities[:stop] = (np.gradient(capacitances[:stop], self.pressures[:stop]) if stop > 1
+                                            else np.nan)
+                self.progress.emit(stop, total)
+                self.partial.emit(self.pressures[:stop], capacitances[:stop].copy(), sensitivities[:stop].copy())
+        except Exception as e:
+            self.failed.emit(str(e))
+        finally:
+            self.finished.emit()
 
 class CapacitanceCalculatorGUI(QMainWindow):
+    # Choices of the lower plot: (y label, title)
+    LOWER_PLOTS = {
+        'Relative change': ('Capacitance Change (%)', 'Relative Capacitance Change vs Pressure'),
+        'Sensitivity': ('Sensitivity dC/dP (fF/Pa)', 'Sensitivity vs Pressure'),
+        'Linearity': ('Sensitivity Deviation (%)', 'Deviation of dC/dP from the Mean Slope'),
+    }
+
     def __init__(self):
         super().__init__()
+        self._worker = None
+        self._threads = set()
         self.setWindowTitle("Plate Capacitance Calculator")
         self.setGeometry(100, 100, 1200, 700)
         
@@ -57,6 +144,37 @@ class CapacitanceCalculatorGUI(QMainWindow):
         calculate_button.clicked.connect(self.calculate_and_plot)
         left_layout.addWidget(calculate_button)
         
+        # Progress of the running calculation and a button to abort it
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setValue(0)
+        self.cancel_button = QPushButton("Cancel")
+        self.cancel_button.setEnabled(False)
+        self.cancel_button.clicked.connect(self.cancel_calculation)
+        left_layout.addWidget(self.progress_bar)
+        left_layout.addWidget(self.cancel_button)
+        
+        # Earlier runs can be kept on the plots for comparison
+        self.overlay_check = QCheckBox("Keep previous runs for comparison")
+        clear_overlays_button = QPushButton("Clear Comparison Runs")
+        clear_overlays_button.clicked.connect(self.clear_overlays)
+        left_layout.addWidget(self.overlay_check)
+        left_layout.addWidget(clear_overlays_button)
+
+        # Sweeps saved by batch runs or the explorer can be plotted without recomputing
+        load_results_button = QPushButton("Load Results...")
+        load_results_button.clicked.connect(self.load_results)
+        left_layout.addWidget(load_results_button)
+
+        # Quantity shown on the lower plot
+        self.lower_plot_combo = QComboBox()
+        self.lower_plot_combo.addItems(list(self.LOWER_PLOTS))
+        self.lower_plot_combo.currentTextChanged.connect(self.on_lower_plot_changed)
+        lower_plot_layout = QHBoxLayout()
+        lower_plot_layout.addWidget(QLabel("Lower plot:"))
+        lower_plot_layout.addWidget(self.lower_plot_combo)
+        left_layout.addLayout(lower_plot_layout)
+        left_layout.addWidget(self.create_profiling_group())
+        
         # Add stretch to push everything up
         left_layout.addStretch()
         
@@ -73,6 +191,12 @@ class CapacitanceCalculatorGUI(QMainWindow):
         right_layout.addWidget(self.canvas1)
         right_layout.addWidget(self.canvas2)
         
+        # Axes and curves are built once and updated in place
+        self.plot1 = LivePlot(self.figure1, 'Pressure (Pa)', 'Capacitance (pF)', 'Capacitance vs Pressure', 'b')
+        self.plot2 = LivePlot(self.figure2, 'Pressure (Pa)', *self.LOWER_PLOTS['Relative change'], 'r')
+        self._run_label = None
+        self._results = None
+        
         # Add panels to splitter
         splitter.addWidget(left_panel)
         splitter.addWidget(right_panel)
@@ -140,6 +264,58 @@ class CapacitanceCalculatorGUI(QMainWindow):
         group.setLayout(layout)
         return group
 
+    def create_profiling_group(self):
+        group = QGroupBox("Profiling")
+        layout = QVBoxLayout()
+        
+        self.profiling_check = QCheckBox("Collect timings and counters")
+        self.profiling_check.toggled.connect(self.on_profiling_toggled)
+        self.profiling_text = QPlainTextEdit()
+        self.profiling_text.setReadOnly(True)
+        self.profiling_text.setLineWrapMode(QPlainTextEdit.NoWrap)
+        self.profiling_text.setStyleSheet("font-family: monospace; font-size: 9px;")
+        self.profiling_text.setMaximumHeight(140)
+        
+        buttons = QHBoxLayout()
+        for label, slot in (("Refresh", self.refresh_profiling), ("Reset", self.reset_profiling),
+                            ("Export...", self.export_profiling)):
+            button = QPushButton(label)
+            button.clicked.connect(slot)
+            buttons.addWidget(button)
+        
+        layout.addWidget(self.profiling_check)
+        layout.addWidget(self.profiling_text)
+        layout.addLayout(buttons)
+        group.setLayout(layout)
+        return group
+
+    def on_profiling_toggled(self, checked):
+        if checked:
+            profiling.enable()
+        else:
+            profiling.disable()
+        self.refresh_profiling()
+
+    def refresh_profiling(self):
+        self.profiling_text.setPlainText(profiling.summary(limit=8))
+
+    def reset_profiling(self):
+        profiling.clear()
+        self.refresh_profiling()
+
+    def export_profiling(self):
+        path, _ = QFileDialog.getSaveFileName(self, "Export Profile", "profile.json",
+                                              "JSON (*.json);;cProfile stats (*.prof)")
+        if not path:
+            return
+        try:
+            if path.endswith('.prof'):
+                profiling.export_pstats(path)
+            else:
+                profiling.export_json(path)
+        except OSError as e:
+            QMessageBox.critical(self, "Error", str(e))
+
     def create_parameters_group(self):
         group = QGroupBox("Parameters")
         layout = QFormLayout()
@@ -148,11 +324,13 @@ class CapacitanceCalculatorGUI(QMainWindow):
         self.pressure_min = QLineEdit('0')
         self.pressure_max = QLineEdit('1000')
         self.pressure_points = QLineEdit('50')
+        self.bias_voltage = QLineEdit('0')
         
         layout.addRow("Initial Gap (m):", self.gap)
         layout.addRow("Min Pressure (Pa):", self.pressure_min)
         layout.addRow("Max Pressure (Pa):", self.pressure_max)
         layout.addRow("Number of Points:", self.pressure_points)
+        layout.addRow("Bias Voltage (V):", self.bias_voltage)
         
         group.setLayout(layout)
         return group
@@ -173,54 +351,177 @@ class CapacitanceCalculatorGUI(QMainWindow):
             material = self.material_combo.currentText()
             thickness = float(self.thickness.text())
             d0 = float(self.gap.text())
+            a = float(self.dim_a.text())
+            b = float(self.dim_b.text()) if shape == 'rectangular' else None
             
             # Create pressure array
             p_min = float(self.pressure_min.text())
             p_max = float(self.pressure_max.text())
             n_points = int(self.pressure_points.text())
             pressures = np.linspace(p_min, p_max, n_points)
-            
-            # Calculate capacitances
-            capacitances = []
-            for p in pressures:
-                if shape == 'circular':
-                    a = float(self.dim_a.text())
-                    cap = calculate_capacitance(shape, boundary, p, material, 
-                                             thickness, a, d0=d0)
-                else:
-                    a = float(self.dim_a.text())
-                    # b = float(self.dim_b.text())
-                    b = 0.001
-                    cap = calculate_capacitance(shape, boundary, p, material, 
-                                             thickness, a, b, d0)
-                capacitances.append(cap)
-            
-            # Convert to numpy array
-            capacitances = np.array(capacitances)
-            
-            # Plot capacitance vs pressure
-            self.figure1.clear()
-            ax1 = self.figure1.add_subplot(111)
-            ax1.plot(pressures, capacitances * 1e12, 'b-', linewidth=2)
-            ax1.set_xlabel('Pressure (Pa)')
-            ax1.set_ylabel('Capacitance (pF)')
-            ax1.set_title('Capacitance vs Pressure')
-            ax1.grid(True)
-            self.figure1.tight_layout()
-            self.canvas1.draw()
-            
+            voltage = float(self.bias_voltage.text())
+        except Exception as e:
+            QMessageBox.critical(self, "Error", str(e))
+            return
+
+        # A new calculation supersedes any job that is still running
+        self.cancel_calculation()
+
+        # The analytic dC/dP is only worth its uncached pass when the lower plot shows it
+        exact_sensitivity = self.lower_plot_combo.currentText() != 'Relative change'
+        worker = SweepWorker(shape, boundary, material, thickness, a, b, d0, pressures, voltage, exact_sensitivity)
+        thread = QThread()
+        worker.moveToThread(thread)
+        thread.started.connect(worker.run)
+        worker.progress.connect(lambda done, total: self.on_progress(worker, done, total))
+        worker.partial.connect(lambda p, c, s: self.on_partial(worker, p, c, s))
+        worker.failed.connect(lambda message: self.on_failed(worker, message))
+        worker.finished.connect(lambda: self.on_finished(worker))
+        worker.finished.connect(thread.quit)
+        thread.finished.connect(lambda: self.on_thread_finished(thread, worker))
+
+        self._worker = worker
+        self._threads.add((thread, worker))
+        self.progress_bar.setRange(0, n_points)
+        self.progress_bar.setValue(0)
+        self.cancel_button.setEnabled(True)
+        for plot in (self.plot1, self.plot2):
+            if self.overlay_check.isChecked():
+                plot.add_overlay(self._run_label)
+            plot.reset(xlim=(p_min, p_max))
+        width = f"b={b:g} m, " if b is not None else ""
+        self._run_label = (f"{material}, t={thickness:g} m, a={a:g} m, {width}d0={d0:g} m"
+                           + (f", {voltage:g} V" if voltage else ""))
+        thread.start()
+
+    def cancel_calculation(self):
+        if self._worker is not None:
+            self._worker.cancel()
+            self._worker = None
+        self.cancel_button.setEnabled(False)
+
+    def on_progress(self, worker, done, total):
+        if worker is self._worker:
+            self.progress_bar.setValue(done)
+
+    def on_partial(self, worker, pressures, capacitances, sensitivities):
+        if worker is self._worker:
+            self.plot_results(pressures, capacitances, sensitivities)
+
+    def on_failed(self, worker, message):
+        if worker is self._worker:
+            QMessageBox.critical(self, "Error", message)
+
+    def on_finished(self, worker):
+        if worker is self._worker:
+            self._worker = None
+            self.cancel_button.setEnabled(False)
+        if profiling.enabled:
+            self.refresh_profiling()
+
+    def on_thread_finished(self, thread, worker):
+        # Release the thread only once it has fully stopped
+        thread.wait()
+        self._threads.discard((thread, worker))
+
+    def closeEvent(self, event):
+        self.cancel_calculation()
+        for thread, _ in list(self._threads):
+            thread.quit()
+            thread.wait()
+        super().closeEvent(event)
+
+    def clear_overlays(self):
+        self.plot1.clear_overlays()
+        self.plot2.clear_overlays()
+
+    # Columns identifying one design (one curve) in a result store; b is NaN for circular plates
+    _STORE_DESIGN = ('shape', 'boundary_condition', 'material_name', 'thickness', 'a', 'b', 'd0')
+
+    @staticmethod
+    def _query_design(store, values, columns):
+        """
+        Rows of one design; NaN values (b of circular plates) match NaN, which == cannot.
+        """
+        nan = [name for name, value in values.items() if isinstance(value, float) and np.isnan(value)]
+        where = [(name, '==', value) for name, value in values.items() if name not in nan]
+        predicate = (lambda data: np.all([np.isnan(data[name]) for name in nan], axis=0)) if nan else None
+        return store.query(where, columns=columns, predicate=predicate)
+
+    def load_results(self):
+        path = QFileDialog.getExistingDirectory(self, "Load Result Store", OUTPUT_DIR)
+        if not path:
+            return
+        try:
+            store = ResultStore.open(path)
+            missing = [name for name in self._STORE_DESIGN + ('P', 'capacitance') if name not in store.columns]
+            if missing:
+                raise ValueError(f"The result store has no {', '.join(missing)} column")
+            # The design entered in the form, or else the first design of the store
+            shape = self.shape_combo.currentText()
+            values = dict(shape=shape, boundary_condition=self.boundary_combo.currentText(),
+                          material_name=self.material_combo.currentText(), thickness=float(self.thickness.text()),
+                          a=float(self.dim_a.text()),
+                          b=float(self.dim_b.text()) if shape == 'rectangular' else np.nan, d0=float(self.gap.text()))
+            columns = list(self._STORE_DESIGN) + ['P', 'capacitance']
+            rows = self._query_design(store, values, columns)
+            if rows['P'].size == 0:
+                first = store.read(list(self._STORE_DESIGN), 0, store.chunk_size)
+                if first['shape'].size == 0:
+                    raise ValueError("The result store is empty")
+                values = {name: first[name][0].item() for name in self._STORE_DESIGN}
+                rows = self._query_design(store, values, columns)
+        except (OSError, ValueError) as e:
+            QMessageBox.critical(self, "Error", str(e))
+            return
+
+        self.cancel_calculation()
+        self.shape_combo.setCurrentText(values['shape'])
+        self.boundary_combo.setCurrentText(values['boundary_condition'])
+        self.material_combo.setCurrentText(values['material_name'])
+        for field, name in ((self.thickness, 'thickness'), (self.dim_a, 'a'), (self.gap, 'd0')):
+            field.setText(f"{values[name]:g}")
+        if values['shape'] == 'rectangular':
+            self.dim_b.setText(f"{values['b']:g}")
+
+        order = np.argsort(rows['P'], kind='stable')
+        pressures, capacitances = rows['P'][order], rows['capacitance'][order]
+        with np.errstate(invalid='ignore'):
+            sensitivities = (np.gradient(capacitances, pressures) if pressures.size > 1
+                             else np.full(pressures.size, np.nan))
+        for plot in (self.plot1, self.plot2):
+            if self.overlay_check.isChecked():
+                plot.add_overlay(self._run_label)
+            plot.reset(xlim=(pressures[0], pressures[-1]))
+        width = f"b={values['b']:g} m, " if values['shape'] == 'rectangular' else ""
+        self._run_label = (f"{values['material_name']}, t={values['thickness']:g} m, a={values['a']:g} m, {width}"
+                           f"d0={values['d0']:g} m (stored)")
+        self.plot_results(pressures, capacitances, sensitivities)
+
+    def on_lower_plot_changed(self, name):
+        # Earlier runs show a different quantity, so they are dropped from the lower plot
+        self.plot2.clear_overlays()
+        self.plot2.relabel(*self.LOWER_PLOTS[name])
+        self.plot2.reset()
+        if self._results is not None:
+            self.plot_results(*self._results)
+
+    @profiling.profiled('gui.plot_results')
+    def plot_results(self, pressures, capacitances, sensitivities):
+        self._results = (pressures, capacitances, sensitivities)
+        # Plot capacitance vs pressure
+        self.plot1.set_data(pressures, capacitances * 1e12)
+        
+        mode = self.lower_plot_combo.currentText()
+        if mode == 'Sensitivity':
+            self.plot2.set_data(pressures, sensitivities * 1e15)
+        elif mode == 'Linearity':
+            # Incremental sensitivity against the mean slope over the range computed so far
+            with np.errstate(invalid='ignore', divide='ignore'):
+                mean_slope = (capacitances[-1] - capacitances[0]) / (pressures[-1] - pressures[0])
+                self.plot2.set_data(pressures, (sensitivities / mean_slope - 1) * 100)
+        else:
             # Plot percentage change
-            self.figure2.clear()
-            ax2 = self.figure2.add_subplot(111)
             c0 = capacitances[0]
             percent_change = ((capacitances - c0) / c0) * 100
-            ax2.plot(pressures, percent_change, 'r-', linewidth=2)
-            ax2.set_xlabel('Pressure (Pa)')
-            ax2.set_ylabel('Capacitance Change (%)')
-            ax2.set_title('Relative Capacitance Change vs Pressure')
-            ax2.grid(True)
-            self.figure2.tight_layout()
-            self.canvas2.draw()
-            
-        except Exception as e:
-            QMessageBox.critical(self, "Error", str(e))
\ No newline at end of file
+            self.plot2.set_data(pressures, percent_change)
@@ -0,0 +1,213 @@
+import json
+
+import numpy as np
+from .capacitance import calculate_capacitance_sweep, calculate_flexural_rigidity
+from .deflections import circular_max_deflection, rectangular_max_deflection
+from .materials import Material
+
+# Fraction of the touch-down pressure covered by default
+_DEFAULT_RANGE = 0.95
+
+# Positions within each table segment where the interpolant is checked against the forward
+# model; slope errors peak near t = 1/3 and 2/3 and cancel at the midpoint
+_CHECK_POINTS = (1 / 3, 2 / 3)
+
+# Safety factor applied to the largest checked interpolation error; the result is an
+# estimate of the worst error between the check points, not a guaranteed bound
+_ERROR_SAFETY = 2.0
+
+# Relative rounding error of a reading, the table entries and the Hermite evaluation,
+# which bounds the error where the interpolant is exact up to rounding
+_ROUNDING = 16 * np.finfo(float).eps
+
+# Newton iterations on each cubic segment; the linear first guess is already close
+_NEWTON_STEPS = 4
+
+# Readings are processed in blocks of this size to bound temporary memory
+_BLOCK_SIZE = 2**18
+
+# Status codes of pressure() readings
+IN_RANGE = 0
+BELOW_RANGE = -1
+ABOVE_RANGE = 1  # beyond the calibrated range, towards touch-down
+
+def touchdown_pressure(shape, boundary_condition, material_name, thickness, a, d0):
+    """
+    Returns the pressure at which the maximum deflection reaches the gap d0.
+    """
+    material = Material.get_material(material_name)
+    if material is None:
+        raise ValueError(f"Material {material_name} not found!")
+    D = calculate_flexural_rigidity(material.young_mod, material.poisson_rat, thickness)
+    if shape == 'circular':
+        return d0 / circular_max_deflection(boundary_condition, 1.0, D, a)
+    if shape == 'rectangular':
+        return d0 / rectangular_max_deflection(boundary_condition, 1.0, D, a)
+    raise ValueError("Calibration tables support circular and rectangular plates")
+
+def _monotone_slopes(x, y, slopes=None):
+    """
+    Derivatives at the table points, limited so that cubic Hermite interpolation stays monotone.
+
+    Exact derivatives are used when given; otherwise second-order estimates from the values.
+    """
+    h = np.diff(x)
+    delta = np.diff(y) / h
+    if slopes is None:
+        slopes = np.empty_like(y)
+        # Three-point (parabolic) derivatives in the interior and at both ends
+        slopes[1:-1] = (h[1:] * delta[:-1] + h[:-1] * delta[1:]) / (h[:-1] + h[1:])
+        slopes[0] = ((2 * h[0] + h[1]) * delta[0] - h[0] * delta[1]) / (h[0] + h[1])
+        slopes[-1] = ((2 * h[-1] + h[-2]) * delta[-1] - h[-1] * delta[-2]) / (h[-1] + h[-2])
+    # Fritsch-Carlson: slopes must share the sign of the secants and stay within 3 times them
+    limit = 3 * np.minimum(np.r_[delta[0], delta], np.r_[delta, delta[-1]])
+    return np.clip(slopes, 0.0, limit)
+
+def _hermite(t, h, c0, c1, m0, m1):
+    """
+    Evaluates a cubic Hermite segment and its derivative with respect to t in [0, 1].
+    """
+    t2 = t * t
+    t3 = t2 * t
+    value = (2 * t3 - 3 * t2 + 1) * c0 + (t3 - 2 * t2 + t) * h * m0 + (3 * t2 - 2 * t3) * c1 + (t3 - t2) * h * m1
+    slope = (6 * t2 - 6 * t) * (c0 - c1) + (3 * t2 - 4 * t + 1) * h * m0 + (3 * t2 - 2 * t) * h * m1
+    return value, slope
+
+class CapacitanceCalibration:
+    """
+    Monotone C(P) calibration table of one sensor design, for converting readings to pressure.
+
+    The forward model is evaluated once on a table of pressures clustered towards both
+    ends of the range, together with its analytic derivative dC/dP, and interpolated with
+    monotone cubic Hermite segments. A reading is
+    located with a binary search and refined with Newton iterations on its segment, so
+    whole arrays of readings are converted without calling the forward model again.
+
+    pressure_error holds an estimated maximum error per segment: the interpolant is only
+    checked against the forward model at a third and two thirds of each segment, and the
+    larger difference is doubled. It is an estimate, not a guaranteed bound.
+    """
+    def __init__(self, design, pressures, capacitances, slopes, pressure_error, touchdown):
+        self.design = dict(design)
+        self.pressures = np.asarray(pressures, dtype=float)
+        self.capacitances = np.asarray(capacitances, dtype=float)
+        self.slopes = np.asarray(slopes, dtype=float)
+        self.pressure_error = np.asarray(pressure_error, dtype=float)
+        self.touchdown = float(touchdown)
+
+    @classmethod
+    def build(cls, shape, boundary_condition, material_name, thickness, a, b=None, d0=1e-6,
+              p_min=0.0, p_max=None, n_points=256, **sweep_options):
+        """
+        Tabulates the forward model of a design.
+
+        Parameters:
+        - shape, boundary_condition, material_name, thickness, a, b, d0: The sensor design
+        - p_min: Lowest calibrated pressure (Pa)
+        - p_max: Highest calibrated pressure (Pa), defaults to 95% of the touch-down pressure
+        - n_points: Number of table entries
+        - sweep_options: Passed on to calculate_capacitance_sweep (modes, n_quad, rtol,
+                         use_cache, which defaults to False)
+
+        Returns:
+        - A CapacitanceCalibration
+        """
+        design = dict(shape=shape, boundary_condition=boundary_condition, material_name=material_name,
+                      thickness=thickness, a=a, b=b, d0=d0)
+        touchdown = touchdown_pressure(shape, boundary_condition, material_name, thickness, a, d0)
+        if p_max is None:
+            p_max = _DEFAULT_RANGE * touchdown
+        if not p_min < p_max < touchdown:
+            raise ValueError("Calibration range must satisfy p_min < p_max < touch-down pressure")
+
+        # Chebyshev-Lobatto spacing puts more entries where C(P) curves fastest
+        nodes = (1 - np.cos(np.linspace(0, np.pi, n_points))) / 2
+        pressures = p_min + (p_max - p_min) * nodes
+        h = np.diff(pressures)
+        checks = [pressures[:-1] + t * h for t in _CHECK_POINTS]
+        # The adaptive rtol path has no derivatives; its slopes are estimated from the table
+        exact = 'rtol' not in sweep_options
+        sweep_options = dict({'use_cache': False}, **sweep_options)
+        forward = calculate_capacitance_sweep(shape, boundary_condition, np.concatenate([pressures] + checks),
+                                              material_name, thickness, a, b, d0, return_gradient=exact,
+                                              **sweep_options)
+        forward, derivatives = (forward[0], forward[1]['P'][:n_points]) if exact else (forward, None)
+        capacitances = forward[:n_points]
+        if not np.all(np.diff(capacitances) > 0):
+            raise ValueError("Capacitance is not strictly increasing over the calibration range")
+        slopes = _monotone_slopes(pressures, capacitances, derivatives)
+
+        # Estimated interpolation error from the check points, converted to pressure through
+        # the smallest slope of each segment, plus the rounding of the inversion itself
+        c_error = np.zeros(n_points - 1)
+        for k, t in enumerate(_CHECK_POINTS):
+            interpolated, _ = _hermite(t, h, capacitances[:-1], capacitances[1:], slopes[:-1], slopes[1:])
+            expected = forward[n_points + k * (n_points - 1):n_points + (k + 1) * (n_points - 1)]
+            c_error = np.maximum(c_error, np.abs(interpolated - expected))
+        min_slope = np.minimum(np.minimum(slopes[:-1], slopes[1:]), np.diff(capacitances) / h)
+        c_error = _ERROR_SAFETY * c_error + _ROUNDING * capacitances[1:]
+        pressure_error = c_error / np.maximum(min_slope, np.finfo(float).tiny)
+        return cls(design, pressures, capacitances, slopes, pressure_error, touchdown)
+
+    @property
+    def capacitance_range(self):
+        return self.capacitances[0], self.capacitances[-1]
+
+    def pressure(self, readings, return_details=False):
+        """
+        Converts capacitance readings to pressure.
+
+        Parameters:
+        - readings: Capacitance readings (F), any array shape
+        - return_details: Also return the estimated maximum errors and range status
+
+        Returns:
+        - Pressures (Pa), NaN for readings outside the calibrated range. With return_details,
+          (pressures, estimated_errors, status) where status is IN_RANGE, BELOW_RANGE or
+          ABOVE_RANGE (towards touch-down)
+        """
+        readings = np.asarray(readings, dtype=float)
+        flat = readings.ravel()
+        pressures = np.empty(flat.shape)
+        errors = np.empty(flat.shape)
+        for start in range(0, flat.size, _BLOCK_SIZE):
+            block = flat[start:start + _BLOCK_SIZE]
+            pressures[start:start + _BLOCK_SIZE], errors[start:start + _BLOCK_SIZE] = self._invert(block)
+
+        status = np.where(flat < self.capacitances[0], BELOW_RANGE,
+                          np.where(flat > self.capacitances[-1], ABOVE_RANGE, IN_RANGE))
+        outside = status != IN_RANGE
+        pressures[outside] = np.nan
+        errors[outside] = np.nan
+        pressures = pressures.reshape(readings.shape)
+        if not return_details:
+            return pressures
+        return pressures, errors.reshape(readings.shape), status.reshape(readings.shape)
+
+    def _invert(self, c):
+        C, P, m = self.capacitances, self.pressures, self.slopes
+        i = np.clip(np.searchsorted(C, c) - 1, 0, len(C) - 2)
+        c0, c1, m0, m1 = C[i], C[i + 1], m[i], m[i + 1]
+        h = P[i + 1] - P[i]
+        t = np.clip((c - c0) / (c1 - c0), 0.0, 1.0)
+        for _ in range(_NEWTON_STEPS):
+            value, slope = _hermite(t, h, c0, c1, m0, m1)
+            t = np.clip(t - (value - c) / np.where(slope > 0, slope, np.inf), 0.0, 1.0)
+        return P[i] + t * h, self.pressure_error[i]
+
+    def save(self, path):
+        """
+        Writes the calibration to an .npz file.
+        """
+        np.savez(path, pressures=self.pressures, capacitances=self.capacitances, slopes=self.slopes,
+                 pressure_error=self.pressure_error, touchdown=self.touchdown,
+                 design=json.dumps(self.design))
+
+    @classmethod
+    def load(cls, path):
+        """
+        Reads a calibration written by save().
+        """
+        with np.load(path) as data:
+            return cls(json.loads(str(data['design'])), data['pressures'], data['capacitances'], data['slopes'],
+                       data['pressure_error'], float(data['touchdown']))
@@ -1,18 +1,32 @@
+import csv
+import json
+
+import numpy as np
+
 class Material:
+    __slots__ = ('name', 'young_mod', 'poisson_rat', 'dielectric_K')
+
     def __init__(self, name, young_mod, poisson_rat, dielectric_K):
         """
         Initialize a material with its properties.
-        
+
         Parameters:
         - name: Name of the material
         - young_mod: Young's modulus (Pa)
         - poisson_rat: Poisson's ratio (dimensionless)
         - dielectric_K: Dielectric constant (dimensionless)
         """
-        self.name = name
-        self.young_mod = young_mod
-        self.poisson_rat = poisson_rat
-        self.dielectric_K = dielectric_K
+        object.__setattr__(self, 'name', name)
+        object.__setattr__(self, 'young_mod', young_mod)
+        object.__setattr__(self, 'poisson_rat', poisson_rat)
+        object.__setattr__(self, 'dielectric_K', dielectric_K)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Material instances are immutable; use Material.add_material to redefine one")
+
+    def __repr__(self):
+        return (f"Material({self.name!r}, young_mod={self.young_mod!r}, poisson_rat={self.poisson_rat!r}, "
+                f"dielectric_K={self.dielectric_K!r})")
 
     # Predefined materials for easy access
     PREDEFINED_MATERIALS = {
@@ -23,49 +37,208 @@ class Material:
     }
 
     @classmethod
-    def get_material(cls, material_name):
+    def get_material(cls, material_name, temperature=None):
         """
         Retrieve a material by name.
-        
+
         Parameters:
         - material_name: The name of the material
-        
+        - temperature: Optional temperature (K) for materials with a temperature table
+
         Returns:
         - A Material object if found, else None
         """
-        material_properties = cls.PREDEFINED_MATERIALS.get(material_name, None)
-        if material_properties:
-            return Material(material_name, **material_properties)
-        return None
-    
+        return registry.get(material_name, temperature)
+
     @classmethod
-    def add_material(cls, name, young_mod, poisson_rat, dielectric_K):
+    def add_material(cls, name, young_mod, poisson_rat, dielectric_K, temperature_table=None):
         """
         Add a new material to the predefined materials list.
-        
+
         Parameters:
         - name: Name of the new material
         - young_mod: Young's modulus (Pa)
         - poisson_rat: Poisson's ratio (dimensionless)
         - dielectric_K: Dielectric constant (dimensionless)
-        
+        - temperature_table: Optional dict with a 'temperature' array (K) and arrays of any
+          of the properties at those temperatures
+
         Returns:
         - A new Material object
         """
-        new_material = Material(name, young_mod, poisson_rat, dielectric_K)
-        cls.PREDEFINED_MATERIALS[name] = {
-            "young_mod": young_mod,
-            "poisson_rat": poisson_rat,
-            "dielectric_K": dielectric_K
-        }
-        return new_material
+        return registry.add(name, young_mod, poisson_rat, dielectric_K, temperature_table)
+
+    @classmethod
+    def load_materials(cls, path):
+        """
+        Add every material defined in a JSON or CSV file (see MaterialRegistry.load).
+
+        Returns:
+        - List of the names loaded
+        """
+        return registry.load(path)
 
     @classmethod
     def list_materials(cls):
         """
         Get a list of all available material names.
-        
+
         Returns:
         - List of material names as strings
         """
-        return list(cls.PREDEFINED_MATERIALS.keys())
\ No newline at end of file
+        return registry.names()
+
+class MaterialRegistry:
+    """
+    Material properties stored as columns (struct of arrays), one row per material.
+
+    Lookups by name return interned, immutable Material instances, and properties() gathers
+    whole property columns for many materials at once, for vectorized evaluation. Materials
+    may carry a temperature table; their properties are then interpolated linearly.
+    Material.PREDEFINED_MATERIALS is kept in sync with the default registry.
+    """
+    PROPERTIES = ('young_mod', 'poisson_rat', 'dielectric_K')
+
+    def __init__(self, materials=None, mirror=None):
+        self._index = {}
+        self._rows = []
+        self._instances = {}
+        self._temperature_tables = {}
+        self._columns = None
+        self._mirror = mirror
+        for name, properties in (materials or {}).items():
+            self.add(name, **properties)
+
+    def add(self, name, young_mod, poisson_rat, dielectric_K, temperature_table=None):
+        """
+        Adds or redefines a material.
+
+        Returns:
+        - The interned Material instance
+        """
+        row = (float(young_mod), float(poisson_rat), float(dielectric_K))
+        if name in self._index:
+            self._rows[self._index[name]] = row
+        else:
+            self._index[name] = len(self._rows)
+            self._rows.append(row)
+        self._columns = None
+        self._instances[name] = Material(name, young_mod, poisson_rat, dielectric_K)
+
+        self._temperature_tables.pop(name, None)
+        if temperature_table is not None:
+            table = {key: np.asarray(values, dtype=float) for key, values in temperature_table.items()}
+            order = np.argsort(table['temperature'])
+            self._temperature_tables[name] = {key: values[order] for key, values in table.items()}
+
+        if self._mirror is not None:
+            self._mirror[name] = {"young_mod": young_mod, "poisson_rat": poisson_rat, "dielectric_K": dielectric_K}
+        return self._instances[name]
+
+    def names(self):
+        return list(self._index)
+
+    def get(self, name, temperature=None):
+        """
+        Returns the interned Material, or None if the name is unknown.
+
+        With a temperature, materials that have a temperature table return a new instance
+        with interpolated properties.
+        """
+        material = self._instances.get(name)
+        if material is None or temperature is None or name not in self._temperature_tables:
+            return material
+        values = self._interpolate(name, np.asarray(temperature, dtype=float))
+        return Material(name, *(float(values[p]) for p in self.PROPERTIES))
+
+    def _interpolate(self, name, temperature):
+        table = self._temperature_tables[name]
+        base = self._instances[name]
+        return {p: np.interp(temperature, table['temperature'], table[p]) if p in table else
+                np.full(np.shape(temperature), getattr(base, p)) for p in self.PROPERTIES}
+
+    def column(self, name):
+        """
+        Returns the read-only array of one property over all materials, in registry order.
+        """
+        if self._columns is None:
+            rows = np.array(self._rows, dtype=float).reshape(-1, len(self.PROPERTIES))
+            self._columns = {p: rows[:, i].copy() for i, p in enumerate(self.PROPERTIES)}
+            for values in self._columns.values():
+                values.flags.writeable = False
+        return self._columns[name]
+
+    def index(self, names):
+        """
+        Returns the row numbers of the given material names.
+        """
+        try:
+            return np.array([self._index[name] for name in np.atleast_1d(names)], dtype=int)
+        except KeyError as e:
+            raise ValueError(f"Material {e.args[0]} not found!")
+
+    def properties(self, names, temperature=None):
+        """
+        Gathers the properties of many materials at once.
+
+        Parameters:
+        - names: Sequence of material names (repeats allowed)
+        - temperature: Optional temperature (K), scalar or one per name
+
+        Returns:
+        - Dictionary mapping each name in PROPERTIES to an array aligned with names
+        """
+        rows = self.index(names)
+        result = {p: self.column(p)[rows] for p in self.PROPERTIES}
+        if temperature is not None and self._temperature_tables:
+            temperature = np.broadcast_to(np.asarray(temperature, dtype=float), rows.shape)
+            names = np.atleast_1d(names)
+            for name in self._temperature_tables.keys() & set(names.tolist()):
+                selected = names == name
+                for p, values in self._interpolate(name, temperature[selected]).items():
+                    result[p][selected] = values
+        return result
+
+    def load(self, path):
+        """
+        Adds every material defined in a JSON or CSV file.
+
+        JSON files hold a list of objects (or an object keyed by name) with the properties
+        and an optional "temperature_table". CSV files have the columns name, young_mod,
+        poisson_rat and dielectric_K, plus an optional temperature column: rows with a
+        temperature form that material's table, and its first row gives the base properties
+        unless a row without temperature is present.
+
+        Returns:
+        - List of the names loaded
+        """
+        if path.endswith('.json'):
+            with open(path) as f:
+                data = json.load(f)
+            entries = [dict(props, name=name) for name, props in data.items()] if isinstance(data, dict) else data
+            for entry in entries:
+                self.add(entry['name'], entry['young_mod'], entry['poisson_rat'], entry['dielectric_K'],
+                         entry.get('temperature_table'))
+            return [entry['name'] for entry in entries]
+
+        if path.endswith('.csv'):
+            base, tables = {}, {}
+            with open(path, newline='') as f:
+                for row in csv.DictReader(f):
+                    values = {p: float(row[p]) for p in self.PROPERTIES}
+                    if row.get('temperature') not in (None, ''):
+                        tables.setdefault(row['name'], []).append(dict(values, temperature=float(row['temperature'])))
+                        base.setdefault(row['name'], values)
+                    else:
+                        base[row['name']] = values
+            for name, values in base.items():
+                table = None
+                if name in tables:
+                    table = {key: [entry[key] for entry in tables[name]] for key in tables[name][0]}
+                self.add(name, temperature_table=table, **values)
+            return list(base)
+
+        raise ValueError("Material files must end in .json or .csv")
+
+# Default registry behind the Material class methods
+registry = MaterialRegistry(Material.PREDEFINED_MATERIALS, mirror=Material.PREDEFINED_MATERIALS)
@@ -0,0 +1,297 @@
+import numpy as np
+from .capacitance import calculate_flexural_rigidity, _validate_design
+from .deflections import circular_max_deflection, rectangular_max_deflection
+from .explorer import explore
+from .materials import registry
+
+# Continuous design variables, searched on a logarithmic scale
+DESIGN_VARIABLES = ('thickness', 'a', 'b', 'd0')
+
+# Objectives that can be optimized; each is turned into a quantity to minimize
+OBJECTIVES = {
+    'sensitivity': lambda metrics: -metrics['sensitivity'],
+    'linearity': lambda metrics: metrics['nonlinearity'],
+    'relative_sensitivity': lambda metrics: -metrics['relative_sensitivity'],
+}
+
+# Metric columns of evaluated designs
+METRICS = ('sensitivity', 'relative_sensitivity', 'nonlinearity', 'max_deflection', 'capacitance_min', 'violation')
+
+# Variation operators: blend crossover range and Gaussian mutation width (in unit log space)
+_BLEND = 0.25
+_MUTATION_SIGMA = 0.1
+
+def _dominates(objectives):
+    """
+    Returns the matrix D with D[i, j] True when design i dominates design j.
+    """
+    less_equal = np.all(objectives[:, None, :] <= objectives[None, :, :], axis=2)
+    less = np.any(objectives[:, None, :] < objectives[None, :, :], axis=2)
+    return less_equal & less
+
+def pareto_rank(objectives, violation=None):
+    """
+    Non-dominated sorting with constraint domination.
+
+    Feasible designs are ranked by their Pareto fronts (0 for the non-dominated front);
+    infeasible designs follow, ordered by their total constraint violation.
+
+    Parameters:
+    - objectives: (n, k) array of quantities to minimize
+    - violation: Optional (n,) array of constraint violations, 0 when feasible
+
+    Returns:
+    - Integer rank of every design
+    """
+    objectives = np.asarray(objectives, dtype=float)
+    n = len(objectives)
+    violation = np.zeros(n) if violation is None else np.asarray(violation, dtype=float)
+    rank = np.empty(n, dtype=int)
+    feasible = np.flatnonzero(violation <= 0)
+
+    dominates = _dominates(objectives[feasible])
+    dominated_by = dominates.sum(axis=0)
+    remaining = np.ones(len(feasible), dtype=bool)
+    front = 0
+    while remaining.any():
+        current = remaining & (dominated_by == 0)
+        rank[feasible[current]] = front
+        remaining &= ~current
+        dominated_by -= dominates[current].sum(axis=0)
+        front += 1
+
+    infeasible = np.flatnonzero(violation > 0)
+    order = np.argsort(violation[infeasible], kind='stable')
+    rank[infeasible[order]] = front + np.arange(len(infeasible))
+    return rank
+
+def crowding_distance(objectives, rank):
+    """
+    NSGA-II crowding distance of every design within its front (inf at the front's ends).
+    """
+    objectives = np.asarray(objectives, dtype=float)
+    distance = np.zeros(len(objectives))
+    for front in np.unique(rank):
+        members = np.flatnonzero(rank == front)
+        if len(members) <= 2:
+            distance[members] = np.inf
+            continue
+        for values in objectives[members].T:
+            order = np.argsort(values)
+            ordered = values[order]
+            span = ordered[-1] - ordered[0]
+            distance[members[order[[0, -1]]]] = np.inf
+            if np.isfinite(span) and span > 0:
+                distance[members[order[1:-1]]] += (ordered[2:] - ordered[:-2]) / span
+    return distance
+
+class DesignOptimizer:
+    """
+    Multi-objective search over diaphragm dimensions, gap and material.
+
+    Candidates are evaluated a population at a time: every candidate becomes a pressure
+    sweep over the operating range in one design table, which the explorer evaluates in
+    process or on a process pool. Metrics of every evaluated candidate are kept, so
+    designs surviving from one generation to the next are never recomputed, and the
+    explorer's result cache is shared with the rest of the application.
+
+    Metrics of a design over [p_min, p_max]:
+    - sensitivity: mean dC/dP (F/Pa), (C(p_max) - C(p_min)) / (p_max - p_min)
+    - relative_sensitivity: sensitivity divided by C(p_min) (1/Pa)
+    - nonlinearity: largest deviation from the least-squares line, as a fraction of the span
+    - max_deflection: maximum deflection at p_max (m)
+    - capacitance_min: C(p_min) (F)
+    - violation: summed relative violation of the constraints, 0 when feasible
+    """
+    def __init__(self, shape, boundary_condition, pressure_range, bounds, materials, objectives=('sensitivity', 'linearity'),
+                 max_deflection_ratio=0.5, min_capacitance=None, n_points=33, n_workers=1, modes=None, n_quad=None,
+                 use_cache=True):
+        """
+        Parameters:
+        - shape, boundary_condition: Plate type ('circular' or 'rectangular')
+        - pressure_range: (p_min, p_max) operating range (Pa)
+        - bounds: Dictionary of (low, high) ranges or fixed values for thickness, a, d0 and,
+                  for rectangular plates, b (m)
+        - materials: List of candidate material names
+        - objectives: Names from OBJECTIVES
+        - max_deflection_ratio: Constraint max deflection <= ratio * d0 at p_max
+        - min_capacitance: Optional constraint C(p_min) >= min_capacitance (F)
+        - n_points: Pressures per sweep used for the metrics
+        - n_workers, modes, n_quad, use_cache: Passed on to explorer.explore
+        """
+        _validate_design(shape, boundary_condition, 0.0)
+        if shape == 'custom':
+            raise ValueError("Custom plates cannot be optimized over their dimensions")
+        unknown = [name for name in objectives if name not in OBJECTIVES]
+        if unknown:
+            raise ValueError(f"Unknown objective {unknown[0]}; choose from {', '.join(OBJECTIVES)}")
+        if n_points < 3:
+            raise ValueError("At least 3 pressure points are needed to measure linearity")
+        registry.index(materials)
+
+        self.shape = shape
+        self.boundary_condition = boundary_condition
+        self.pressures = np.linspace(pressure_range[0], pressure_range[1], n_points)
+        self.variables = [name for name in DESIGN_VARIABLES if shape == 'rectangular' or name != 'b']
+        missing = [name for name in self.variables if name not in bounds]
+        if missing:
+            raise ValueError(f"Design bounds are missing: {', '.join(missing)}")
+        limits = np.array([(bounds[name], bounds[name]) if np.ndim(bounds[name]) == 0 else bounds[name]
+                           for name in self.variables], dtype=float)
+        if np.any(limits <= 0) or np.any(limits[:, 1] < limits[:, 0]):
+            raise ValueError("Design bounds must be positive (low, high) ranges")
+        self.log_low = np.log(limits[:, 0])
+        self.log_span = np.log(limits[:, 1]) - self.log_low
+        self.materials = list(materials)
+        self.objectives = tuple(objectives)
+        self.max_deflection_ratio = max_deflection_ratio
+        self.min_capacitance = min_capacitance
+        self.explore_options = dict(n_workers=n_workers, modes=modes, n_quad=n_quad, use_cache=use_cache)
+        self._evaluated = {}
+
+    def _decode(self, unit, material_index):
+        values = np.exp(self.log_low + unit * self.log_span)
+        designs = {name: values[:, i] for i, name in enumerate(self.variables)}
+        designs['material_name'] = np.asarray(self.materials)[material_index]
+        return designs
+
+    def evaluate(self, designs):
+        """
+        Computes the metrics of a population of designs.
+
+        Parameters:
+        - designs: Dictionary of equal-length arrays with material_name and the design variables
+
+        Returns:
+        - Dictionary mapping each name in METRICS to an array
+        """
+        names = np.asarray(designs['material_name'], dtype=str)
+        n = len(names)
+        b = designs.get('b', np.full(n, np.nan))
+        # NaN never compares equal, so the missing width of circular plates is keyed as None
+        keys = [(name, float(t), float(a), None if np.isnan(bb) else float(bb), float(d)) for name, t, a, bb, d in
+                zip(names.tolist(), designs['thickness'], designs['a'], b, designs['d0'])]
+        todo = sorted({key for key in keys if key not in self._evaluated})
+        if todo:
+            self._evaluated.update(zip(todo, self._compute(todo)))
+        rows = np.array([self._evaluated[key] for key in keys]).reshape(n, len(METRICS))
+        return {name: rows[:, i] for i, name in enumerate(METRICS)}
+
+    def _compute(self, keys):
+        """
+        Evaluates new designs as one batch of pressure sweeps.
+        """
+        names = np.array([key[0] for key in keys])
+        thickness, a, b, d0 = (np.array([key[i] for key in keys], dtype=float) for i in range(1, 5))
+        m = len(self.pressures)
+        table = dict(shape=np.full(len(keys) * m, self.shape),
+                     boundary_condition=np.full(len(keys) * m, self.boundary_condition),
+                     material_name=np.repeat(names, m), thickness=np.repeat(thickness, m), a=np.repeat(a, m),
+                     b=np.repeat(b, m), d0=np.repeat(d0, m), P=np.tile(self.pressures, len(keys)))
+        C = explore(table, **self.explore_options)['capacitance'].reshape(len(keys), m)
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            span = C[:, -1] - C[:, 0]
+            sensitivity = span / (self.pressures[-1] - self.pressures[0])
+            x = self.pressures - self.pressures.mean()
+            slope = (C - C.mean(axis=1, keepdims=True)) @ x / (x @ x)
+            residual = C - C.mean(axis=1, keepdims=True) - slope[:, None] * x
+            nonlinearity = np.abs(residual).max(axis=1) / np.abs(span)
+            nonlinearity = np.where(np.isfinite(nonlinearity), nonlinearity, np.inf)
+
+        properties = registry.properties(names)
+        D = calculate_flexural_rigidity(properties['young_mod'], properties['poisson_rat'], thickness)
+        max_deflection = circular_max_deflection if self.shape == 'circular' else rectangular_max_deflection
+        deflection = max_deflection(self.boundary_condition, self.pressures[-1], D, a)
+
+        violation = np.maximum(deflection / (self.max_deflection_ratio * d0) - 1, 0)
+        if self.min_capacitance is not None:
+            violation += np.maximum(1 - C[:, 0] / self.min_capacitance, 0)
+        violation = np.where(np.isfinite(C).all(axis=1), violation, np.inf)
+        return np.column_stack([np.where(np.isfinite(sensitivity), sensitivity, -np.inf),
+                                np.where(np.isfinite(sensitivity), sensitivity / C[:, 0], -np.inf),
+                                nonlinearity, deflection, C[:, 0], violation])
+
+    def _objectives(self, metrics):
+        return np.column_stack([OBJECTIVES[name](metrics) for name in self.objectives])
+
+    def run(self, generations=30, population_size=48, seed=None, return_all=False):
+        """
+        Runs an NSGA-II style evolutionary search.
+
+        Each generation breeds population_size offspring by binary tournament, blend
+        crossover and Gaussian mutation in log-scaled design space; parents and offspring
+        are ranked together by constraint domination and crowding, and the best survive.
+
+        Parameters:
+        - generations: Number of generations
+        - population_size: Designs per generation
+        - seed: Optional random seed
+        - return_all: Also return every design evaluated so far
+
+        Returns:
+        - Columnar table (dictionary of arrays) of the feasible Pareto front, sorted by the
+          first objective; with return_all, (front, evaluated)
+        """
+        rng = np.random.default_rng(seed)
+        k = len(self.variables)
+        unit = rng.random((population_size, k))
+        material = rng.integers(len(self.materials), size=population_size)
+        metrics = self.evaluate(self._decode(unit, material))
+
+        for _ in range(generations):
+            objectives = self._objectives(metrics)
+            rank = pareto_rank(objectives, metrics['violation'])
+            crowding = crowding_distance(objectives, rank)
+
+            # Binary tournaments on (rank, -crowding)
+            contenders = rng.integers(population_size, size=(2, 2, population_size))
+            better = lambda i, j: np.where((rank[i] < rank[j]) | ((rank[i] == rank[j]) & (crowding[i] > crowding[j])), i, j)
+            first, second = better(*contenders[0]), better(*contenders[1])
+
+            gamma = rng.uniform(-_BLEND, 1 + _BLEND, size=(population_size, k))
+            child = unit[first] + gamma * (unit[second] - unit[first])
+            mutate = rng.random((population_size, k)) < 1 / (k + 1)
+            child = np.clip(child + mutate * rng.normal(0, _MUTATION_SIGMA, size=child.shape), 0, 1)
+            child_material = np.where(rng.random(population_size) < 0.5, material[first], material[second])
+            reset = rng.random(population_size) < 1 / (k + 1)
+            child_material[reset] = rng.integers(len(self.materials), size=reset.sum())
+
+            child_metrics = self.evaluate(self._decode(child, child_material))
+            unit = np.vstack([unit, child])
+            material = np.concatenate([material, child_material])
+            metrics = {name: np.concatenate([metrics[name], child_metrics[name]]) for name in METRICS}
+
+            objectives = self._objectives(metrics)
+            rank = pareto_rank(objectives, metrics['violation'])
+            crowding = crowding_distance(objectives, rank)
+            survivors = np.lexsort((-crowding, rank))[:population_size]
+            unit, material = unit[survivors], material[survivors]
+            metrics = {name: values[survivors] for name, values in metrics.items()}
+
+        front = self.pareto_front()
+        return (front, self.evaluated()) if return_all else front
+
+    def evaluated(self):
+        """
+        Returns every design evaluated so far as a columnar table with its metrics.
+        """
+        keys = list(self._evaluated)
+        rows = np.array([self._evaluated[key] for key in keys]).reshape(len(keys), len(METRICS))
+        table = dict(material_name=np.array([key[0] for key in keys], dtype=str))
+        for i, name in enumerate(('thickness', 'a', 'b', 'd0'), start=1):
+            table[name] = np.array([key[i] for key in keys], dtype=float)
+        table.update({name: rows[:, i] for i, name in enumerate(METRICS)})
+        return table
+
+    def pareto_front(self):
+        """
+        Returns the feasible non-dominated designs among all evaluated ones.
+        """
+        table = self.evaluated()
+        objectives = self._objectives(table)
+        rank = pareto_rank(objectives, table['violation'])
+        keep = (rank == 0) & (table['violation'] <= 0)
+        keep &= np.isfinite(objectives).all(axis=1)
+        order = np.flatnonzero(keep)[np.argsort(objectives[keep, 0], kind='stable')]
+        return {name: values[order] for name, values in table.items()}
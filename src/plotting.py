@@ -0,0 +1,181 @@
+import numpy as np
+
+# Curves with more than this many points per horizontal pixel are decimated
+_POINTS_PER_PIXEL = 2
+
+# Fraction of the data range added above and below when the y limits have to grow
+_Y_HEADROOM = 0.1
+
+# Colours cycled through by overlaid runs
+OVERLAY_COLORS = ('#7f7f7f', '#ff7f0e', '#2ca02c', '#9467bd', '#8c564b', '#e377c2', '#17becf')
+
+def decimate_minmax(x, y, n_bins):
+    """
+    Reduces a curve to the minimum and maximum of each of n_bins index buckets.
+
+    The reduced curve draws exactly like the full one at a resolution of n_bins pixels,
+    because every bucket keeps its vertical extent. x must be sorted.
+
+    Parameters:
+    - x, y: Curve coordinates
+    - n_bins: Number of buckets, normally the axes width in pixels
+
+    Returns:
+    - (x, y) with at most 2 * n_bins points; the input itself when it is already small
+    """
+    x = np.asarray(x)
+    y = np.asarray(y)
+    if len(x) <= _POINTS_PER_PIXEL * n_bins:
+        return x, y
+    starts = np.linspace(0, len(x), n_bins + 1).astype(int)[:-1]
+    ends = np.r_[starts[1:], len(x)] - 1
+    with np.errstate(invalid='ignore'):
+        low = np.fmin.reduceat(y, starts)
+        high = np.fmax.reduceat(y, starts)
+    # Draw each bucket's extent in the direction the curve is heading
+    rising = y[ends] >= y[starts]
+    x_out = np.repeat(x[starts], 2)
+    x_out[1::2] = x[ends]
+    y_out = np.empty(2 * n_bins)
+    y_out[0::2] = np.where(rising, low, high)
+    y_out[1::2] = np.where(rising, high, low)
+    return x_out, y_out
+
+class LivePlot:
+    """
+    Persistent axes whose curves are updated in place and redrawn by blitting.
+
+    The axes, labels and grid are built once. The live curve is an animated Line2D updated
+    with set_data; the static parts of the figure (including overlaid earlier runs) are
+    cached as a background bitmap on every full draw, so an update only restores the
+    background and redraws the one line. A full redraw happens only when the axis limits
+    must change. Curves are min/max decimated to the axes' pixel width over the visible
+    x range, so long sweeps cost no more to draw than short ones.
+    """
+    def __init__(self, figure, xlabel, ylabel, title, color='b'):
+        self.figure = figure
+        self.canvas = figure.canvas
+        self.ax = figure.add_subplot(111)
+        self.ax.set_xlabel(xlabel)
+        self.ax.set_ylabel(ylabel)
+        self.ax.set_title(title)
+        self.ax.grid(True)
+        (self.line,) = self.ax.plot([], [], color=color, linewidth=2, animated=True)
+        self.figure.tight_layout()
+
+        self._data = (np.empty(0), np.empty(0))
+        self._overlays = []
+        self._background = None
+        self._y_fixed = False
+        self.canvas.mpl_connect('draw_event', self._on_draw)
+        self.canvas.mpl_connect('resize_event', lambda event: self.figure.tight_layout())
+        self.ax.callbacks.connect('xlim_changed', lambda ax: self._decimate_overlays())
+
+    def _pixel_width(self):
+        return max(1, int(self.ax.bbox.width))
+
+    def _visible(self, x, y):
+        """
+        Returns the part of a sorted curve inside the x limits (plus one point either side),
+        decimated to the axes width.
+        """
+        low, high = self.ax.get_xlim()
+        start = max(np.searchsorted(x, low) - 1, 0)
+        stop = np.searchsorted(x, high, side='right') + 1
+        return decimate_minmax(x[start:stop], y[start:stop], self._pixel_width())
+
+    def _decimate_overlays(self):
+        for line, x, y in self._overlays:
+            line.set_data(*self._visible(x, y))
+
+    def _on_draw(self, event):
+        # A full draw just happened: cache it and draw the live curve on top
+        self._background = self.canvas.copy_from_bbox(self.figure.bbox)
+        self.line.set_data(*self._visible(*self._data))
+        self.ax.draw_artist(self.line)
+
+    def relabel(self, ylabel, title):
+        self.ax.set_ylabel(ylabel)
+        self.ax.set_title(title)
+        self.canvas.draw_idle()
+
+    def reset(self, xlim=None):
+        """
+        Starts a new run: empties the live curve and optionally fixes the x limits.
+        """
+        self._data = (np.empty(0), np.empty(0))
+        if xlim is not None and xlim[0] < xlim[1]:
+            self.ax.set_xlim(*xlim)
+        self.ax.set_ylim(0, 1)
+        self._y_fixed = False
+        self.canvas.draw_idle()
+
+    def set_data(self, x, y):
+        """
+        Replaces the live curve; x must be sorted.
+        """
+        x = np.asarray(x, dtype=float)
+        y = np.asarray(y, dtype=float)
+        self._data = (x, y)
+        # The decimated curve keeps every extreme, so the limits are checked on it
+        visible = self._visible(x, y)
+        finite = visible[1][np.isfinite(visible[1])]
+        if finite.size and self._extend_limits(finite.min(), finite.max()):
+            self.canvas.draw_idle()
+            return
+        self.update(visible)
+
+    def _extend_limits(self, low, high):
+        """
+        Grows the y limits (with headroom) when the data leaves them; returns True if changed.
+        """
+        bottom, top = self.ax.get_ylim()
+        if self._y_fixed:
+            if bottom <= low and high <= top:
+                return False
+            low, high = min(low, bottom), max(high, top)
+        else:
+            # First data of a run: keep the overlaid runs in view as well
+            for _, _, y in self._overlays:
+                finite = y[np.isfinite(y)]
+                if finite.size:
+                    low, high = min(low, finite.min()), max(high, finite.max())
+        margin = (high - low) * _Y_HEADROOM or abs(high) * _Y_HEADROOM or 1.0
+        self.ax.set_ylim(low - margin, high + margin)
+        self._y_fixed = True
+        return True
+
+    def update(self, visible=None):
+        """
+        Redraws the live curve over the cached background.
+        """
+        if self._background is None:
+            self.canvas.draw_idle()
+            return
+        self.line.set_data(*(visible or self._visible(*self._data)))
+        self.canvas.restore_region(self._background)
+        self.ax.draw_artist(self.line)
+        self.canvas.blit(self.ax.bbox)
+
+    def add_overlay(self, label=None):
+        """
+        Freezes the live curve as a static overlay for comparison with later runs.
+        """
+        x, y = self._data
+        if x.size == 0:
+            return
+        color = OVERLAY_COLORS[len(self._overlays) % len(OVERLAY_COLORS)]
+        (line,) = self.ax.plot(*self._visible(x, y), color=color, linewidth=1, alpha=0.8, label=label)
+        self._overlays.append((line, x, y))
+        if label is not None:
+            self.ax.legend(loc='best', fontsize='small')
+        self.canvas.draw_idle()
+
+    def clear_overlays(self):
+        for line, _, _ in self._overlays:
+            line.remove()
+        self._overlays = []
+        legend = self.ax.get_legend()
+        if legend is not None:
+            legend.remove()
+        self.canvas.draw_idle()
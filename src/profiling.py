@@ -0,0 +1,181 @@
+import json
+import marshal
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+# Opt-in instrumentation of the calculation and plotting hot paths. Timed stages nest and
+# are recorded under the path of the stages enclosing them (e.g.
+# calculate_capacitance/calculate_capacitance_rectangular/dblquad), next to plain event
+# counters. While disabled, stage() returns a shared no-op context manager and count()
+# returns at once; hot loops guard their counters with `if profiling.enabled:`.
+enabled = False
+
+_lock = threading.Lock()
+_timers = {}  # stage path -> [calls, total s, own s (excluding nested stages), min s, max s]
+_counters = {}  # counter name -> count
+_local = threading.local()
+
+def enable(reset=False):
+    global enabled
+    if reset:
+        clear()
+    enabled = True
+
+def disable():
+    global enabled
+    enabled = False
+
+def clear():
+    with _lock:
+        _timers.clear()
+        _counters.clear()
+
+@contextmanager
+def session(reset=True):
+    """
+    Enables profiling for the duration of a with block, restoring the previous state after.
+    """
+    previous = enabled
+    enable(reset)
+    try:
+        yield
+    finally:
+        if not previous:
+            disable()
+
+def _stack():
+    stack = getattr(_local, 'stack', None)
+    if stack is None:
+        stack = _local.stack = []
+    return stack
+
+class _NullStage:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NULL_STAGE = _NullStage()
+
+class _Stage:
+    __slots__ = ('name', 'path', 'start', 'nested')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        stack = _stack()
+        self.path = (stack[-1].path + '/' if stack else '') + self.name
+        self.nested = 0.0
+        stack.append(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        stack = _stack()
+        stack.pop()
+        if stack:
+            stack[-1].nested += elapsed
+        own = elapsed - self.nested
+        with _lock:
+            entry = _timers.get(self.path)
+            if entry is None:
+                _timers[self.path] = [1, elapsed, own, elapsed, elapsed]
+            else:
+                entry[0] += 1
+                entry[1] += elapsed
+                entry[2] += own
+                entry[3] = min(entry[3], elapsed)
+                entry[4] = max(entry[4], elapsed)
+        return False
+
+def stage(name):
+    """
+    Returns a context manager timing the enclosed block as stage name.
+    """
+    return _Stage(name) if enabled else _NULL_STAGE
+
+def profiled(name=None):
+    """
+    Decorator timing every call of a function as a stage (default: its qualified name).
+    """
+    def decorate(func):
+        label = name or func.__qualname__
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not enabled:
+                return func(*args, **kwargs)
+            with _Stage(label):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+def count(name, n=1):
+    """
+    Adds n to the counter name.
+    """
+    if not enabled:
+        return
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + n
+
+def snapshot():
+    """
+    Returns the collected statistics.
+
+    Returns:
+    - Dictionary with 'timers' (stage path -> calls, total, own, min and max seconds) and
+      'counters' (name -> count)
+    """
+    with _lock:
+        timers = {path: dict(zip(('calls', 'total', 'own', 'min', 'max'), entry)) for path, entry in _timers.items()}
+        return dict(enabled=enabled, timers=timers, counters=dict(_counters))
+
+def export_json(path):
+    with open(path, 'w') as f:
+        json.dump(dict(snapshot(), created=time.strftime('%Y-%m-%dT%H:%M:%S')), f, indent=2)
+    return path
+
+def export_pstats(path):
+    """
+    Writes the stage timings in the marshalled format of cProfile, so pstats.Stats(path)
+    and the usual profile viewers can read them. Each stage name is one function, and
+    enclosing stages appear as its callers.
+    """
+    function = lambda name: ('profiling', 0, name)
+    stats = {}
+    with _lock:
+        entries = [(stage_path, tuple(entry)) for stage_path, entry in _timers.items()]
+    for stage_path, (calls, total, own, _, _) in entries:
+        names = stage_path.split('/')
+        key = function(names[-1])
+        cc, nc, tt, ct, callers = stats.get(key, (0, 0, 0.0, 0.0, {}))
+        if len(names) > 1:
+            caller = function(names[-2])
+            c = callers.get(caller, (0, 0, 0.0, 0.0))
+            callers[caller] = (c[0] + calls, c[1] + calls, c[2] + own, c[3] + total)
+        stats[key] = (cc + calls, nc + calls, tt + own, ct + total, callers)
+    with open(path, 'wb') as f:
+        marshal.dump(stats, f)
+    return path
+
+def summary(limit=12):
+    """
+    Formats the most expensive stages and all counters as a short text table.
+    """
+    stats = snapshot()
+    lines = [f"{'stage':<44} {'calls':>7} {'total ms':>10} {'own ms':>9}"]
+    timers = sorted(stats['timers'].items(), key=lambda item: -item[1]['total'])[:limit]
+    for path, t in timers:
+        label = path if len(path) <= 44 else '...' + path[-41:]
+        lines.append(f"{label:<44} {t['calls']:>7} {t['total'] * 1e3:>10.2f} {t['own'] * 1e3:>9.2f}")
+    for name, value in sorted(stats['counters'].items()):
+        lines.append(f"{name:<44} {value:>7}")
+    return '\n'.join(lines)
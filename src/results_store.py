@@ -0,0 +1,301 @@
+import hashlib
+import json
+import os
+import time
+
+import numpy as np
+from .utils import output_path
+
+# Rows per chunk of a new store
+DEFAULT_CHUNK_SIZE = 2**16
+
+MANIFEST = 'manifest.json'
+
+# Comparison operators accepted by ResultStore.query
+_OPERATORS = {
+    '==': np.equal,
+    '!=': np.not_equal,
+    '<': np.less,
+    '<=': np.less_equal,
+    '>': np.greater,
+    '>=': np.greater_equal,
+    'in': lambda values, options: np.isin(values, list(options)),
+}
+
+def default_store_path(name=None):
+    """
+    Returns a directory for a new store in output/results/, named after the current time by default.
+    """
+    return os.path.dirname(output_path('results', name or time.strftime('%Y%m%d-%H%M%S'), MANIFEST))
+
+def fingerprint(columns):
+    """
+    Hash of a columnar table, used to check that a resumed job is the one that was started.
+    """
+    digest = hashlib.sha1()
+    for name in sorted(columns):
+        values = np.ascontiguousarray(columns[name])
+        digest.update(name.encode())
+        digest.update(str(values.dtype).encode())
+        digest.update(values.tobytes())
+    return digest.hexdigest()
+
+def _write_atomic(path, write):
+    """
+    Writes a file through a temporary name, so a crash never leaves a partial file behind.
+    """
+    temporary = path + '.tmp'
+    with open(temporary, 'wb') as f:
+        write(f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporary, path)
+
+def _chunk_summary(values):
+    """
+    Zone map of one chunk column: the distinct values of text; for numbers the finite
+    (min, max), or None without finite values, and whether NaN, inf or -inf occur.
+
+    JSON cannot hold non-finite numbers, so these are recorded as flags rather than in the range.
+    """
+    if values.dtype.kind == 'U':
+        return sorted(set(values.tolist()))
+    finite = values[np.isfinite(values)]
+    return dict(min=float(finite.min()) if finite.size else None, max=float(finite.max()) if finite.size else None,
+                nan=bool(np.isnan(values).any()), posinf=bool(np.isposinf(values).any()),
+                neginf=bool(np.isneginf(values).any()))
+
+def _may_match(summary, operator, value):
+    """
+    Whether a chunk with the given zone map can contain rows meeting the condition.
+    """
+    if isinstance(summary, list):
+        options = value if operator == 'in' else [value]
+        if operator == '!=':
+            return summary != [value]
+        return operator not in ('==', 'in') or bool(set(summary) & set(options))
+    if not isinstance(summary, dict):
+        # Zone maps of older stores left out non-finite values, so they cannot rule a chunk out
+        return True
+    if operator == '!=':
+        return True
+    # Range of the values other than NaN, widened to the infinities present
+    low = -np.inf if summary['neginf'] else summary['min']
+    high = np.inf if summary['posinf'] else summary['max']
+    if low is None:
+        low = np.inf if summary['posinf'] else None
+    if high is None:
+        high = -np.inf if summary['neginf'] else None
+    values = list(value) if operator == 'in' else [value]
+    if summary['nan'] and operator in ('==', 'in') and any(v != v for v in values):
+        return True
+    if low is None:
+        return False
+    if operator in ('==', 'in'):
+        return any(low <= v <= high for v in values)
+    if operator == '<':
+        return low < value
+    if operator == '<=':
+        return low <= value
+    if operator == '>':
+        return high > value
+    if operator == '>=':
+        return high >= value
+    return True
+
+class ResultStore:
+    """
+    Columnar results on disk, in fixed-size chunks with a JSON manifest.
+
+    Every column of chunk i is one .npy file, <column>/<i>.npy, written atomically; the
+    chunk only counts as complete once the manifest lists it, so an interrupted job resumes
+    from the chunks that made it into the manifest. Chunks are memory-mapped for reading,
+    and the manifest keeps a zone map per chunk (min/max and non-finite flags of numbers,
+    distinct text values), so slices and filtering queries only touch the chunks that can
+    match. A store has a single writer at a time.
+    """
+    def __init__(self, path, manifest):
+        self.path = path
+        self._manifest = manifest
+        self._chunks = {entry['index']: entry for entry in manifest['chunks']}
+
+    @classmethod
+    def create(cls, path, columns, chunk_size=DEFAULT_CHUNK_SIZE, n_rows=None, metadata=None, overwrite=False):
+        """
+        Creates an empty store.
+
+        Parameters:
+        - path: Directory of the store
+        - columns: Dictionary mapping column names to dtypes; str means text
+        - chunk_size: Rows per chunk
+        - n_rows: Optional total number of rows the job will write
+        - metadata: Optional JSON-serializable dictionary kept in the manifest
+        - overwrite: Replace the manifest of an existing store
+
+        Returns:
+        - The new ResultStore
+        """
+        if chunk_size < 1:
+            raise ValueError("Chunk size must be at least 1")
+        if os.path.exists(os.path.join(path, MANIFEST)) and not overwrite:
+            raise ValueError(f"A result store already exists in {path}")
+        # Text columns are stored unsized; every chunk takes the width of its longest value
+        dtypes = {name: np.dtype(dtype).str for name, dtype in columns.items()}
+        manifest = dict(version=1, chunk_size=int(chunk_size), n_rows=None if n_rows is None else int(n_rows),
+                        columns=dtypes, metadata=metadata or {}, chunks=[],
+                        created=time.strftime('%Y-%m-%dT%H:%M:%S'))
+        for name in dtypes:
+            os.makedirs(os.path.join(path, name), exist_ok=True)
+        store = cls(path, manifest)
+        store._save_manifest()
+        return store
+
+    @classmethod
+    def open(cls, path):
+        with open(os.path.join(path, MANIFEST)) as f:
+            return cls(path, json.load(f))
+
+    def _save_manifest(self):
+        self._manifest['chunks'] = [self._chunks[i] for i in sorted(self._chunks)]
+        data = json.dumps(self._manifest, indent=1).encode()
+        _write_atomic(os.path.join(self.path, MANIFEST), lambda f: f.write(data))
+
+    @property
+    def columns(self):
+        return list(self._manifest['columns'])
+
+    @property
+    def chunk_size(self):
+        return self._manifest['chunk_size']
+
+    @property
+    def metadata(self):
+        return self._manifest['metadata']
+
+    @property
+    def n_chunks(self):
+        """
+        Number of chunks of the whole job (known when n_rows was given), else of those written.
+        """
+        if self._manifest['n_rows'] is not None:
+            return -(-self._manifest['n_rows'] // self.chunk_size)
+        return max(self._chunks, default=-1) + 1
+
+    def completed_chunks(self):
+        return sorted(self._chunks)
+
+    def missing_chunks(self):
+        """
+        Chunks of the job that have not been written yet.
+        """
+        return [i for i in range(self.n_chunks) if i not in self._chunks]
+
+    def __len__(self):
+        return sum(entry['rows'] for entry in self._chunks.values())
+
+    def write_chunk(self, index, columns):
+        """
+        Writes chunk index and records it in the manifest.
+
+        Parameters:
+        - index: Chunk number; rows index * chunk_size onwards
+        - columns: Dictionary with an equal-length array for every column of the store
+        """
+        dtypes = self._manifest['columns']
+        missing = [name for name in dtypes if name not in columns]
+        if missing:
+            raise ValueError(f"Chunk is missing columns: {', '.join(missing)}")
+        rows = len(columns[next(iter(dtypes))])
+        if rows > self.chunk_size or any(len(columns[name]) != rows for name in dtypes):
+            raise ValueError(f"Chunk columns must have the same length, at most {self.chunk_size} rows")
+        summary = {}
+        for name, dtype in dtypes.items():
+            if np.dtype(dtype).kind == 'U':
+                # Sized from the data, so long names are never truncated (even in stores whose
+                # manifest still gives a fixed width)
+                values = np.asarray(columns[name]).astype(str)
+            else:
+                values = np.asarray(columns[name]).astype(dtype, copy=False)
+            _write_atomic(self._chunk_path(name, index), lambda f: np.save(f, values))
+            summary[name] = _chunk_summary(values)
+        self._chunks[int(index)] = dict(index=int(index), rows=int(rows), summary=summary)
+        self._save_manifest()
+
+    def append(self, columns):
+        """
+        Writes the next chunk after the last one and returns its index.
+        """
+        index = max(self._chunks, default=-1) + 1
+        self.write_chunk(index, columns)
+        return index
+
+    def _chunk_path(self, name, index):
+        return os.path.join(self.path, name, f'{index:06d}.npy')
+
+    def chunk(self, index, columns=None):
+        """
+        Returns the columns of one chunk as read-only memory maps.
+        """
+        if index not in self._chunks:
+            raise ValueError(f"Chunk {index} has not been written")
+        return {name: np.load(self._chunk_path(name, index), mmap_mode='r') for name in (columns or self.columns)}
+
+    def read(self, columns=None, start=0, stop=None):
+        """
+        Reads rows start:stop of the given columns, touching only the chunks they span.
+
+        Row numbers follow the chunk order; rows of chunks not yet written are skipped.
+        """
+        columns = columns or self.columns
+        size = self.chunk_size
+        stop = self.n_chunks * size if stop is None else stop
+        parts = {name: [] for name in columns}
+        for index in range(start // size, -(-stop // size)):
+            if index not in self._chunks:
+                continue
+            data = self.chunk(index, columns)
+            lo, hi = max(start - index * size, 0), stop - index * size
+            for name in columns:
+                parts[name].append(data[name][lo:hi])
+        return {name: np.concatenate(values) if values else np.empty(0, self._manifest['columns'][name])
+                for name, values in parts.items()}
+
+    def query(self, where=(), columns=None, predicate=None):
+        """
+        Returns the rows meeting every condition, scanning one chunk at a time.
+
+        Parameters:
+        - where: Conditions (column, operator, value) with operator one of ==, !=, <, <=,
+                 >, >= and in; chunks whose zone map rules a condition out are not read
+        - columns: Columns to return, default all
+        - predicate: Optional function of a chunk's column dictionary returning a row mask,
+                     for conditions involving several columns
+
+        Returns:
+        - Dictionary of arrays with the matching rows, plus their 'row' numbers
+        """
+        where = list(where)
+        for name, operator, _ in where:
+            if name not in self._manifest['columns']:
+                raise ValueError(f"Unknown column {name}")
+            if operator not in _OPERATORS:
+                raise ValueError(f"Unknown operator {operator}; use one of {', '.join(_OPERATORS)}")
+        columns = columns or self.columns
+        parts = {name: [] for name in list(columns) + ['row']}
+        for index in self.completed_chunks():
+            summary = self._chunks[index]['summary']
+            if not all(_may_match(summary[name], operator, value) for name, operator, value in where):
+                continue
+            data = self.chunk(index)
+            mask = np.ones(self._chunks[index]['rows'], dtype=bool)
+            for name, operator, value in where:
+                mask &= _OPERATORS[operator](data[name], value)
+            if predicate is not None:
+                mask &= predicate(data)
+            selected = np.flatnonzero(mask)
+            if selected.size:
+                for name in columns:
+                    parts[name].append(np.asarray(data[name][selected]))
+                parts['row'].append(index * self.chunk_size + selected)
+        dtypes = dict(self._manifest['columns'], row=int)
+        return {name: np.concatenate(values) if values else np.empty(0, dtypes[name]) for name, values in parts.items()}
@@ -0,0 +1,422 @@
+import asyncio
+import http.client
+import json
+import math
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import numpy as np
+from .capacitance import CapacitanceCache, calculate_capacitance_sweep, result_cache, _validate_design
+from .deflections import rectangular_modes
+from .materials import Material
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8750
+
+# Requests arriving within this many seconds of the first pending one share a batch
+DEFAULT_WINDOW = 0.002
+
+# A batch is dispatched at once when it reaches this many pressure points
+DEFAULT_MAX_BATCH = 4096
+
+# Largest request body accepted (bytes)
+_MAX_BODY = 16 * 2**20
+
+# Latencies kept for the percentiles reported by stats()
+_LATENCY_SAMPLES = 10000
+
+_STATUS_TEXT = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 413: 'Payload Too Large', 500: 'Internal Server Error'}
+
+def _init_worker(materials):
+    # Materials added at runtime must exist in the worker too
+    for name, properties in materials.items():
+        Material.add_material(name, **properties)
+
+def _evaluate(design, pressures, material):
+    """
+    Worker task: one batched sweep of a design, bypassing the worker's own cache.
+
+    material holds the properties of the design's material as the service knows them, so
+    materials added or redefined after the pool started reach the workers too.
+    """
+    shape, boundary_condition, material_name, thickness, a, b, d0, modes, n_quad = design
+    if material is not None and Material.PREDEFINED_MATERIALS.get(material_name) != material:
+        Material.add_material(material_name, **material)
+    return calculate_capacitance_sweep(shape, boundary_condition, np.asarray(pressures), material_name, thickness, a,
+                                       b, d0, modes=modes, n_quad=n_quad, use_cache=False)
+
+def _encode_result(value):
+    """
+    Response fields of one result. JSON has no infinity, so capacitances past touch-down
+    are sent as null with touched_down set (a list of flags for a sweep).
+    """
+    if isinstance(value, list):
+        return dict(capacitance=[v if math.isfinite(v) else None for v in value],
+                    touched_down=[math.isinf(v) for v in value])
+    return dict(capacitance=value if math.isfinite(value) else None, touched_down=math.isinf(value))
+
+def _decode_result(result):
+    """
+    Inverse of _encode_result: the capacitance with inf restored past touch-down.
+    """
+    value, touched_down = result['capacitance'], result['touched_down']
+    if isinstance(value, list):
+        return [math.inf if t else (math.nan if v is None else v) for v, t in zip(value, touched_down)]
+    return math.inf if touched_down else (math.nan if value is None else value)
+
+class CapacitanceService:
+    """
+    Shared front end that batches capacitance requests from many concurrent clients.
+
+    Requests are split into (design, pressure) points. Points found in the shared result
+    cache are answered at once; points already being computed for another request share
+    that computation; the rest wait at most one batching window, after which the pending
+    points of each design are evaluated as one vectorized sweep on the worker pool. All
+    clients therefore share the cache, the in-flight work and the pool.
+
+    Results come from the batched quadrature of calculate_capacitance_sweep, also for
+    single points, so they carry its accuracy (about 5e-6 relative up to half the gap,
+    1e-4 close to touch-down).
+    """
+    def __init__(self, n_workers=None, window=DEFAULT_WINDOW, max_batch=DEFAULT_MAX_BATCH, cache=None):
+        """
+        Parameters:
+        - n_workers: Worker processes, defaults to the CPU count; 0 evaluates on a thread of
+                     this process instead
+        - window: Batching window (s)
+        - max_batch: Pending points that trigger a batch before the window ends
+        - cache: CapacitanceCache shared by all clients, the process-wide result_cache by default
+        """
+        self.n_workers = (os.cpu_count() or 1) if n_workers is None else n_workers
+        self.window = window
+        self.max_batch = max_batch
+        self.cache = result_cache if cache is None else cache
+        self._executor = None
+        self._pending = {}  # design -> {cache key: future}
+        self._pending_points = 0
+        self._in_flight = {}  # cache key -> future
+        self._flush_handle = None
+        self._counters = dict(requests=0, points=0, cache_hits=0, shared_in_flight=0, batches=0, sweeps=0,
+                              computed_points=0, errors=0)
+        self._latencies = deque(maxlen=_LATENCY_SAMPLES)
+
+    def start(self):
+        if self._executor is None:
+            if self.n_workers == 0:
+                self._executor = ThreadPoolExecutor(1)
+            else:
+                self._executor = ProcessPoolExecutor(self.n_workers, initializer=_init_worker,
+                                                     initargs=(dict(Material.PREDEFINED_MATERIALS),))
+        return self
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
+
+    @staticmethod
+    def _design(request):
+        """
+        Normalizes the design fields of a request into a hashable tuple.
+        """
+        shape = request.get('shape')
+        boundary_condition = request.get('boundary_condition')
+        b = request.get('b')
+        _validate_design(shape, boundary_condition, b)
+        if shape == 'custom':
+            raise ValueError("The service evaluates circular and rectangular plates")
+        modes = request.get('modes')
+        if shape == 'rectangular':
+            modes = rectangular_modes(boundary_condition, modes)
+            b = float(b)
+        else:
+            modes, b = None, None
+        n_quad = request.get('n_quad')
+        n_quad = None if n_quad is None else (int(n_quad) if np.ndim(n_quad) == 0 else tuple(int(n) for n in n_quad))
+        return (shape, boundary_condition, request['material_name'], float(request['thickness']), float(request['a']),
+                b, float(request.get('d0', 1e-6)), modes, n_quad)
+
+    async def calculate(self, request):
+        """
+        Capacitance of one request.
+
+        Parameters:
+        - request: Dictionary with the arguments of calculate_capacitance (shape,
+                   boundary_condition, material_name, thickness, a, b, d0, modes) plus
+                   either P or a list of pressures, and optionally n_quad
+
+        Returns:
+        - Capacitance in Farads for P, or a list for pressures; inf past touch-down
+        """
+        start = time.perf_counter()
+        design = self._design(request)
+        material = Material.get_material(design[2])
+        if material is None:
+            raise ValueError(f"Material {design[2]} not found!")
+        single = 'pressures' not in request
+        pressures = [float(request['P'])] if single else [float(p) for p in request['pressures']]
+        prefix = CapacitanceCache.make_key(design[0], design[1], material, *design[3:7],
+                                           ('service', design[7], design[8]))
+        keys = [prefix + (p,) for p in pressures]
+        self._counters['requests'] += 1
+        self._counters['points'] += len(keys)
+
+        if self.cache.persistent:
+            # SQLite lookups would block every other connection on the event loop
+            results = await asyncio.get_running_loop().run_in_executor(None, self.cache.get_many, keys)
+        else:
+            results = self.cache.get_many(keys)
+        waiting = {}
+        for i, (key, value) in enumerate(zip(keys, results)):
+            if value is not None:
+                self._counters['cache_hits'] += 1
+                continue
+            future = self._in_flight.get(key)
+            if future is not None:
+                self._counters['shared_in_flight'] += 1
+            else:
+                future = self._submit(design, key)
+            waiting[i] = future
+        if waiting:
+            values = await asyncio.gather(*waiting.values())
+            for i, value in zip(waiting, values):
+                results[i] = value
+        self._latencies.append(time.perf_counter() - start)
+        return results[0] if single else results
+
+    def _submit(self, design, key):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._in_flight[key] = future
+        self._pending.setdefault(design, {})[key] = future
+        self._pending_points += 1
+        if self._pending_points >= self.max_batch:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.window, self._flush)
+        return future
+
+    def _flush(self):
+        """
+        Dispatches every pending design as one sweep on the worker pool.
+        """
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        pending, self._pending, self._pending_points = self._pending, {}, 0
+        if not pending:
+            return
+        self.start()
+        self._counters['batches'] += 1
+        loop = asyncio.get_running_loop()
+        for design, points in pending.items():
+            self._counters['sweeps'] += 1
+            self._counters['computed_points'] += len(points)
+            task = loop.run_in_executor(self._executor, _evaluate, design, [key[-1] for key in points],
+                                        Material.PREDEFINED_MATERIALS.get(design[2]))
+            task.add_done_callback(lambda task, points=points: self._resolve(points, task))
+
+    def _resolve(self, points, task):
+        keys = list(points)
+        if task.exception() is not None:
+            self._counters['errors'] += 1
+            for key in keys:
+                self._in_flight.pop(key, None)
+                if not points[key].done():
+                    points[key].set_exception(task.exception())
+            return
+        values = np.asarray(task.result(), dtype=float).tolist()
+        for key, value in zip(keys, values):
+            self._in_flight.pop(key, None)
+            if not points[key].done():
+                points[key].set_result(value)
+        if self.cache.persistent:
+            asyncio.get_running_loop().run_in_executor(None, self.cache.put_many, keys, values)
+        else:
+            self.cache.put_many(keys, values)
+
+    def stats(self):
+        """
+        Returns the request counters, latency percentiles (ms) and cache statistics.
+        """
+        stats = dict(self._counters)
+        if self._latencies:
+            p50, p99, p999 = np.percentile(np.array(self._latencies) * 1e3, [50, 99, 99.9]).tolist()
+            stats.update(latency_p50_ms=p50, latency_p99_ms=p99, latency_p999_ms=p999)
+        stats['points_per_sweep'] = stats['computed_points'] / stats['sweeps'] if stats['sweeps'] else 0.0
+        stats['cache'] = self.cache.stats()
+        return stats
+
+    async def _handle(self, method, target, body):
+        """
+        Routes one HTTP request; returns (status, JSON-serializable payload).
+        """
+        if method == 'GET' and target == '/health':
+            return 200, dict(status='ok')
+        if method == 'GET' and target == '/stats':
+            return 200, self.stats()
+        if method != 'POST' or target not in ('/capacitance', '/sweep', '/batch'):
+            return 404, dict(error=f"No route for {method} {target}")
+        try:
+            request = json.loads(body or b'null')
+            if target == '/batch':
+                if not isinstance(request, list):
+                    raise ValueError("A batch is a list of requests")
+                results = await asyncio.gather(*(self.calculate(item) for item in request), return_exceptions=True)
+                return 200, dict(results=[dict(error=str(r)) if isinstance(r, Exception) else _encode_result(r)
+                                          for r in results])
+            if not isinstance(request, dict):
+                raise ValueError("A request is a JSON object")
+            if target == '/sweep' and 'pressures' not in request:
+                raise ValueError("A sweep needs a list of pressures")
+            if target == '/capacitance' and 'P' not in request:
+                raise ValueError("A capacitance request needs a pressure P")
+            return 200, _encode_result(await self.calculate(request))
+        except (ValueError, KeyError, TypeError) as e:
+            self._counters['errors'] += 1
+            return 400, dict(error=str(e) if not isinstance(e, KeyError) else f"Missing field {e.args[0]}")
+
+    async def _serve_connection(self, reader, writer):
+        """
+        HTTP/1.1 with keep-alive: reads requests with a Content-Length body until the client closes.
+        """
+        try:
+            while True:
+                line = await reader.readline()
+                if not line.strip():
+                    break
+                method, target, _ = line.decode('latin-1').split(' ', 2)
+                headers = {}
+                while True:
+                    header = await reader.readline()
+                    if header in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = header.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                length = int(headers.get('content-length', 0))
+                if length > _MAX_BODY:
+                    status, payload = 413, dict(error="Request body too large")
+                else:
+                    body = await reader.readexactly(length) if length else b''
+                    try:
+                        status, payload = await self._handle(method, target, body)
+                    except Exception as e:
+                        status, payload = 500, dict(error=str(e))
+                try:
+                    data = json.dumps(payload, allow_nan=False).encode()
+                except ValueError:
+                    status, payload = 500, dict(error="Response is not valid JSON")
+                    data = json.dumps(payload).encode()
+                keep_alive = headers.get('connection', '').lower() != 'close' and status != 413
+                writer.write(f"HTTP/1.1 {status} {_STATUS_TEXT[status]}\r\nContent-Type: application/json\r\n"
+                             f"Content-Length: {len(data)}\r\nConnection: {'keep-alive' if keep_alive else 'close'}"
+                             f"\r\n\r\n".encode() + data)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host=DEFAULT_HOST, port=DEFAULT_PORT, ready=None):
+        """
+        Serves JSON over HTTP until cancelled.
+
+        Routes: POST /capacitance (one P), POST /sweep (a list of pressures), POST /batch (a
+        list of either), GET /stats and GET /health. Bodies are the request dictionaries
+        of calculate(); responses hold 'capacitance' and 'touched_down' or 'error'. Results
+        past touch-down are null with touched_down true, as JSON has no infinity.
+
+        Parameters:
+        - host, port: Address to listen on; port 0 picks a free port
+        - ready: Optional function called with the bound (host, port) once listening
+        """
+        self.start()
+        server = await asyncio.start_server(self._serve_connection, host, port)
+        if ready is not None:
+            ready(server.sockets[0].getsockname()[:2])
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            self.close()
+
+def run_service(host=DEFAULT_HOST, port=DEFAULT_PORT, n_workers=None, window=DEFAULT_WINDOW, persistent_cache=False):
+    """
+    Runs a CapacitanceService in the foreground until interrupted.
+    """
+    if persistent_cache:
+        result_cache.open_store()
+    service = CapacitanceService(n_workers=n_workers, window=window)
+    try:
+        asyncio.run(service.serve(host, port,
+                                  ready=lambda address: print(f"Serving on http://{address[0]}:{address[1]}")))
+    except KeyboardInterrupt:
+        pass
+
+class ServiceClient:
+    """
+    Blocking client of a running CapacitanceService, keeping one connection open.
+    """
+    def __init__(self, host=DEFAULT_HOST, port=DEFAULT_PORT, timeout=60.0):
+        self._connection = http.client.HTTPConnection(host, port, timeout=timeout)
+
+    def _request(self, method, target, payload=None):
+        body = None if payload is None else json.dumps(payload)
+        headers = {'Content-Type': 'application/json'} if body is not None else {}
+        try:
+            self._connection.request(method, target, body, headers)
+            response = self._connection.getresponse()
+        except (ConnectionError, http.client.HTTPException):
+            # The server may have closed an idle connection; retry once on a fresh one
+            self._connection.close()
+            self._connection.request(method, target, body, headers)
+            response = self._connection.getresponse()
+        result = json.loads(response.read())
+        if response.status != 200:
+            raise ValueError(result.get('error', f"Service returned status {response.status}"))
+        return result
+
+    def calculate_capacitance(self, shape, boundary_condition, P, material_name, thickness, a, b=None, d0=1e-6,
+                              modes=None):
+        """
+        Same arguments and result as capacitance.calculate_capacitance, computed by the service.
+        """
+        request = dict(shape=shape, boundary_condition=boundary_condition, P=P, material_name=material_name,
+                       thickness=thickness, a=a, b=b, d0=d0, modes=modes)
+        return _decode_result(self._request('POST', '/capacitance', request))
+
+    def calculate_capacitance_sweep(self, shape, boundary_condition, pressures, material_name, thickness, a, b=None,
+                                    d0=1e-6, modes=None, n_quad=None):
+        """
+        Same arguments and result as capacitance.calculate_capacitance_sweep, computed by the service.
+        """
+        request = dict(shape=shape, boundary_condition=boundary_condition,
+                       pressures=np.asarray(pressures, dtype=float).ravel().tolist(), material_name=material_name,
+                       thickness=thickness, a=a, b=b, d0=d0, modes=modes, n_quad=n_quad)
+        values = _decode_result(self._request('POST', '/sweep', request))
+        return np.array(values, dtype=float).reshape(np.shape(pressures))
+
+    def batch(self, requests):
+        """
+        Sends several request dictionaries at once; returns one dict per request with
+        'capacitance' (inf past touch-down) or 'error'.
+        """
+        return [result if 'error' in result else dict(capacitance=_decode_result(result))
+                for result in self._request('POST', '/batch', list(requests))['results']]
+
+    def stats(self):
+        return self._request('GET', '/stats')
+
+    def close(self):
+        self._connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
@@ -0,0 +1,201 @@
+import itertools
+import json
+
+import numpy as np
+from numpy.polynomial import chebyshev
+from .capacitance import capacitance_factor, epsilon_0, _validate_design
+from .deflections import CIRCULAR_WMAX_DIVISOR, _RECTANGULAR_WMAX_DIVISOR
+from .materials import Material
+
+# Parameters of the surrogate box; a material may be given instead of its properties
+BOX_PARAMETERS = ('P', 'thickness', 'a', 'b', 'd0', 'young_mod', 'poisson_rat', 'dielectric_K')
+
+# Degree of every Chebyshev panel and validation points checked per panel
+_DEGREE = 24
+_VALIDATION_POINTS = 97
+
+# Panels are bisected until they meet the tolerance or become this narrow
+_MIN_PANEL_WIDTH = 1e-9
+
+def _load_parameter(P, thickness, a, d0, young_mod, poisson_rat):
+    """
+    Dimensionless load lam = P * a^4 / (D * d0) on which the normalized capacitance depends.
+    """
+    D = young_mod * thickness**3 / (12 * (1 - poisson_rat**2))
+    return P * a**4 / (D * d0)
+
+def _box_from_bounds(bounds):
+    box = {}
+    for name, value in bounds.items():
+        if name == 'material_name':
+            continue
+        low, high = (value, value) if np.ndim(value) == 0 else value
+        box[name] = (float(low), float(high))
+    if 'material_name' in bounds:
+        material = Material.get_material(bounds['material_name'])
+        if material is None:
+            raise ValueError(f"Material {bounds['material_name']} not found!")
+        for name in ('young_mod', 'poisson_rat', 'dielectric_K'):
+            box[name] = (getattr(material, name),) * 2
+    missing = [name for name in BOX_PARAMETERS if name not in box and name != 'b']
+    if missing:
+        raise ValueError(f"Surrogate bounds are missing: {', '.join(missing)}")
+    return box
+
+class CapacitanceSurrogate:
+    """
+    Piecewise Chebyshev response surface of the capacitance over a bounded parameter box.
+
+    For every shape and boundary condition C = K * epsilon_0 * area / d0 * F(lam) with the
+    single load parameter lam = P * a^4 / (D * d0), so the whole box maps onto an interval
+    of lam. F is fitted there from the existing integration routines, with panels bisected
+    until a dense validation check meets the tolerance; the remaining factors are exact.
+    """
+    def __init__(self, shape, boundary_condition, box, breakpoints, coefficients, max_error, options):
+        self.shape = shape
+        self.boundary_condition = boundary_condition
+        self.box = {name: tuple(limits) for name, limits in box.items()}
+        self.breakpoints = np.asarray(breakpoints, dtype=float)
+        self.coefficients = np.asarray(coefficients, dtype=float)
+        self.max_error = float(max_error)
+        self.options = dict(options)
+
+    @classmethod
+    def fit(cls, shape, boundary_condition, bounds, tol=1e-6, modes=None, n_quad=None):
+        """
+        Fits the surrogate over a parameter box.
+
+        Parameters:
+        - shape: 'circular' or 'rectangular'
+        - boundary_condition: 'simply_supported' or 'clamped'
+        - bounds: Dictionary of (low, high) ranges or fixed values for P, thickness, a, b, d0
+                  and either material_name or young_mod, poisson_rat and dielectric_K
+        - tol: Target maximum relative error with respect to the exact path
+        - modes, n_quad: Options of the exact path (see capacitance_factor)
+
+        Returns:
+        - A CapacitanceSurrogate; max_error holds the largest validated relative error
+        """
+        _validate_design(shape, boundary_condition, 0.0)
+        box = _box_from_bounds(bounds)
+        options = dict(modes=None if modes is None else tuple(modes), n_quad=n_quad)
+
+        # lam is monotone in every parameter, so its extremes lie on the corners of the box
+        corners = itertools.product(*(box[name] for name in ('P', 'thickness', 'a', 'd0', 'young_mod',
+                                                              'poisson_rat')))
+        lams = [_load_parameter(*corner) for corner in corners]
+        lam_low, lam_high = min(lams), max(lams)
+        divisor = (CIRCULAR_WMAX_DIVISOR if shape == 'circular' else _RECTANGULAR_WMAX_DIVISOR)[boundary_condition]
+        if lam_high >= divisor:
+            raise ValueError("The parameter box reaches touch-down; reduce the pressure or gap range")
+        if lam_high == lam_low:
+            lam_high = lam_low + max(abs(lam_low), 1.0) * 1e-6
+
+        exact = lambda lam: np.asarray(capacitance_factor(shape, boundary_condition, lam, **options))
+        # The w_max cap switches branch when the load changes sign, so F has a kink at lam = 0
+        panels = [(lam_low, 0.0), (0.0, lam_high)] if lam_low < 0 < lam_high else [(lam_low, lam_high)]
+        done = []
+        max_error = 0.0
+        while panels:
+            low, high = panels.pop()
+            to_panel = lambda x: low + (x + 1) * (high - low) / 2
+            coefficients = chebyshev.chebinterpolate(lambda x: exact(to_panel(x)), _DEGREE)
+            check = np.cos(np.linspace(0, np.pi, _VALIDATION_POINTS))
+            reference = exact(to_panel(check))
+            error = np.max(np.abs(chebyshev.chebval(check, coefficients) / reference - 1))
+            if error > tol and high - low > _MIN_PANEL_WIDTH * max(1.0, abs(high)):
+                middle = (low + high) / 2
+                panels += [(middle, high), (low, middle)]
+            else:
+                done.append((low, coefficients))
+                max_error = max(max_error, error)
+        done.sort(key=lambda panel: panel[0])
+        breakpoints = [low for low, _ in done] + [lam_high]
+        return cls(shape, boundary_condition, box, breakpoints, [c for _, c in done], max_error, options)
+
+    def contains(self, P, thickness, a, d0, young_mod, poisson_rat, dielectric_K, b=None):
+        """
+        Returns a boolean array telling which points lie inside the fitted box.
+        """
+        values = dict(P=P, thickness=thickness, a=a, b=b, d0=d0, young_mod=young_mod,
+                      poisson_rat=poisson_rat, dielectric_K=dielectric_K)
+        inside = np.ones(np.broadcast(*(v for v in values.values() if v is not None)).shape, dtype=bool)
+        for name, value in values.items():
+            if value is None or name not in self.box:
+                continue
+            low, high = self.box[name]
+            inside &= (np.asarray(value) >= low) & (np.asarray(value) <= high)
+        return inside
+
+    def factor(self, lam):
+        """
+        Evaluates the fitted normalized capacitance F(lam) with Clenshaw recurrence.
+        """
+        lam = np.asarray(lam, dtype=float)
+        panel = np.clip(np.searchsorted(self.breakpoints, lam, side='right') - 1, 0, len(self.coefficients) - 1)
+        low, high = self.breakpoints[panel], self.breakpoints[panel + 1]
+        x = 2 * (lam - low) / (high - low) - 1
+        # Gather one coefficient per step rather than a full (points x degree) matrix
+        single = len(self.coefficients) == 1
+        coefficient = lambda k: self.coefficients[0, k] if single else self.coefficients[panel, k]
+        two_x = 2 * x
+        b1 = np.zeros_like(x)
+        b2 = np.zeros_like(x)
+        for k in range(self.coefficients.shape[1] - 1, 0, -1):
+            b1, b2 = two_x * b1 - b2 + coefficient(k), b1
+        return x * b1 - b2 + coefficient(0)
+
+    def evaluate(self, P, thickness, a, d0, young_mod=None, poisson_rat=None, dielectric_K=None, b=None,
+                 material_name=None):
+        """
+        Evaluates the capacitance for arrays of design points.
+
+        Points outside the fitted box are computed with the exact path instead.
+
+        Parameters:
+        - P, thickness, a, b, d0: Arrays (or scalars) broadcast against each other
+        - young_mod, poisson_rat, dielectric_K: Material properties, or give material_name
+
+        Returns:
+        - Capacitances in Farads with the broadcast shape of the inputs
+        """
+        if material_name is not None:
+            material = Material.get_material(material_name)
+            if material is None:
+                raise ValueError(f"Material {material_name} not found!")
+            young_mod, poisson_rat, dielectric_K = material.young_mod, material.poisson_rat, material.dielectric_K
+        if self.shape == 'rectangular' and b is None:
+            raise ValueError("Width 'b' must be specified for rectangular plate")
+
+        P, thickness, a, d0, young_mod, poisson_rat, dielectric_K = np.broadcast_arrays(
+            *(np.asarray(v, dtype=float) for v in (P, thickness, a, d0, young_mod, poisson_rat, dielectric_K)))
+        lam = _load_parameter(P, thickness, a, d0, young_mod, poisson_rat)
+        inside = self.contains(P, thickness, a, d0, young_mod, poisson_rat, dielectric_K, b)
+
+        factor = np.empty(lam.shape)
+        factor[inside] = self.factor(lam[inside])
+        if not inside.all():
+            factor[~inside] = capacitance_factor(self.shape, self.boundary_condition, lam[~inside], **self.options)
+        area = np.pi * a**2 if self.shape == 'circular' else a * np.asarray(b, dtype=float)
+        return dielectric_K * epsilon_0 * area / d0 * factor
+
+    def save(self, path):
+        """
+        Writes the surrogate to a compact .npz file.
+        """
+        meta = dict(shape=self.shape, boundary_condition=self.boundary_condition, box=self.box,
+                    max_error=self.max_error, options=self.options)
+        np.savez(path, breakpoints=self.breakpoints, coefficients=self.coefficients, meta=json.dumps(meta))
+
+    @classmethod
+    def load(cls, path):
+        """
+        Reads a surrogate written by save().
+        """
+        with np.load(path) as data:
+            meta = json.loads(str(data['meta']))
+            options = dict(meta['options'])
+            if options.get('modes') is not None:
+                options['modes'] = tuple(options['modes'])
+            return cls(meta['shape'], meta['boundary_condition'], meta['box'], data['breakpoints'],
+                       data['coefficients'], meta['max_error'], options)
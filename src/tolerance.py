@@ -0,0 +1,362 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from scipy import stats
+from scipy.stats import qmc
+from .capacitance import capacitance_factor, calculate_flexural_rigidity, epsilon_0, _plate_area, _validate_design
+from .materials import Material
+
+# Inputs that may be given a distribution
+PARAMETERS = ('thickness', 'a', 'b', 'd0', 'young_mod', 'poisson_rat', 'dielectric_K')
+
+# Samples per chunk; a power of two keeps every Sobol chunk balanced
+DEFAULT_CHUNK_SIZE = 2**16
+
+# Histogram resolution of the streaming statistics; quantiles are read from it, so their
+# error is at most one bin width (a 2000th of the pilot range). Values outside the range
+# only land in an underflow or overflow bin, and a quantile falling there is interpolated
+# between the range edge and the observed min or max, with no such bound
+_HISTOGRAM_BINS = 2000
+
+# Quantiles reported for every output
+QUANTILES = (0.001, 0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99, 0.999)
+
+# Uniform draws are kept this far from 0 and 1 so unbounded distributions stay finite
+_U_MARGIN = 1e-12
+
+def _draw(spec, u):
+    """
+    Maps uniform draws onto one input distribution through its inverse CDF.
+
+    spec is a number (fixed value) or a dictionary with 'dist' and its parameters:
+    normal (mean, std), uniform (low, high), lognormal (median, sigma), triangular
+    (low, mode, high) or truncnormal (mean, std, low, high).
+    """
+    if not isinstance(spec, dict):
+        return np.full(u.shape, float(spec))
+    u = np.clip(u, _U_MARGIN, 1 - _U_MARGIN)
+    dist = spec['dist']
+    if dist == 'normal':
+        return spec['mean'] + spec['std'] * stats.norm.ppf(u)
+    if dist == 'uniform':
+        return spec['low'] + (spec['high'] - spec['low']) * u
+    if dist == 'lognormal':
+        return spec['median'] * np.exp(spec['sigma'] * stats.norm.ppf(u))
+    if dist == 'triangular':
+        low, mode, high = spec['low'], spec['mode'], spec['high']
+        return stats.triang.ppf(u, (mode - low) / (high - low), loc=low, scale=high - low)
+    if dist == 'truncnormal':
+        mean, std = spec['mean'], spec['std']
+        return stats.truncnorm.ppf(u, (spec['low'] - mean) / std, (spec['high'] - mean) / std, loc=mean, scale=std)
+    raise ValueError(f"Unknown distribution '{dist}'; use normal, uniform, lognormal, triangular or truncnormal")
+
+def _nominal(spec):
+    """
+    Central value of an input distribution.
+    """
+    if not isinstance(spec, dict):
+        return float(spec)
+    if spec['dist'] in ('normal', 'truncnormal'):
+        return float(spec['mean'])
+    if spec['dist'] == 'lognormal':
+        return float(spec['median'])
+    if spec['dist'] == 'triangular':
+        return float(spec['mode'])
+    return (spec['low'] + spec['high']) / 2
+
+class RunningStats:
+    """
+    Constant-memory, mergeable statistics of a stream of values.
+
+    Mean and variance are accumulated with Welford's algorithm (merged with Chan's
+    formula); a fixed-bin histogram with underflow and overflow counts doubles as the
+    quantile sketch. Non-finite values (touch-down) are counted but not accumulated.
+    """
+    def __init__(self, low, high, bins=_HISTOGRAM_BINS):
+        self.edges = np.linspace(low, high, bins + 1)
+        self.counts = np.zeros(bins + 2, dtype=np.int64)  # underflow, bins..., overflow
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+        self.nonfinite = 0
+
+    def add(self, values):
+        values = np.asarray(values, dtype=float).ravel()
+        finite = values[np.isfinite(values)]
+        self.nonfinite += values.size - finite.size
+        if finite.size == 0:
+            return
+        chunk = RunningStats.__new__(RunningStats)
+        chunk.n = finite.size
+        chunk.mean = finite.mean()
+        chunk.m2 = ((finite - chunk.mean)**2).sum()
+        self._merge_moments(chunk)
+        self.min = min(self.min, finite.min())
+        self.max = max(self.max, finite.max())
+        self.counts += np.bincount(np.searchsorted(self.edges, finite, side='right'), minlength=self.counts.size)
+
+    def _merge_moments(self, other):
+        n = self.n + other.n
+        delta = other.mean - self.mean
+        self.mean += delta * other.n / n
+        self.m2 += other.m2 + delta**2 * self.n * other.n / n
+        self.n = n
+
+    def merge(self, other):
+        if other.n:
+            self._merge_moments(other)
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self.counts += other.counts
+        self.nonfinite += other.nonfinite
+        return self
+
+    @property
+    def variance(self):
+        return self.m2 / (self.n - 1) if self.n > 1 else np.nan
+
+    def quantile(self, q):
+        """
+        Quantile estimate by linear interpolation within the histogram bins.
+        """
+        q = np.asarray(q, dtype=float)
+        cumulative = np.cumsum(self.counts)
+        target = q * self.n
+        index = np.clip(np.searchsorted(cumulative, target, side='left'), 0, self.counts.size - 1)
+        # Values in the underflow/overflow bins are only known to lie between min/max and the range
+        lower = np.r_[self.min, self.edges][index]
+        upper = np.r_[self.edges, self.max][index]
+        before = np.where(index > 0, cumulative[index - 1], 0)
+        fraction = np.where(self.counts[index] > 0, (target - before) / np.maximum(self.counts[index], 1), 0.5)
+        return lower + np.clip(fraction, 0, 1) * (upper - lower)
+
+    def confidence_halfwidth(self, z):
+        return z * np.sqrt(self.variance / self.n) if self.n > 1 else np.inf
+
+    def summary(self, z):
+        quantiles = self.quantile(QUANTILES)
+        return dict(n=self.n, mean=self.mean, std=np.sqrt(self.variance), ci_halfwidth=self.confidence_halfwidth(z),
+                    min=self.min, max=self.max, nonfinite=self.nonfinite,
+                    quantiles=dict(zip(QUANTILES, quantiles.tolist())),
+                    histogram=dict(edges=self.edges, counts=self.counts[1:-1], underflow=int(self.counts[0]),
+                                   overflow=int(self.counts[-1])))
+
+def _evaluate(problem, u):
+    """
+    Evaluates the outputs of a block of samples given as uniform draws.
+
+    Returns:
+    - (capacitance, sensitivity) arrays
+    """
+    values = {name: _draw(problem['distributions'][name], u[:, i]) for i, name in enumerate(problem['random'])}
+    fixed = {name: np.full(len(u), _nominal(spec)) for name, spec in problem['distributions'].items()
+             if name not in values}
+    values.update(fixed)
+    D = calculate_flexural_rigidity(values['young_mod'], values['poisson_rat'], values['thickness'])
+    scale = values['dielectric_K'] * epsilon_0 * _plate_area(problem['shape'], values['a'], values.get('b')) / values['d0']
+    p_min, p_max = problem['pressure_range']
+    load = values['a']**4 / (D * values['d0'])
+    with np.errstate(invalid='ignore'):
+        c_min = scale * np.asarray(capacitance_factor(problem['shape'], problem['boundary_condition'], p_min * load,
+                                                      **problem['options']))
+        c_max = scale * np.asarray(capacitance_factor(problem['shape'], problem['boundary_condition'], p_max * load,
+                                                      **problem['options']))
+    return c_min, (c_max - c_min) / (p_max - p_min)
+
+def _uniforms(problem, start, size):
+    d = len(problem['random'])
+    if problem['sampler'] == 'sobol':
+        # Sobol points are only balanced in power-of-two blocks; start is a multiple of the
+        # (power-of-two) chunk size, so a full block is drawn and trimmed to size
+        sampler = qmc.Sobol(d, scramble=True, seed=problem['seed'])
+        if start:
+            sampler.fast_forward(start)
+        return sampler.random(1 << (size - 1).bit_length())[:size]
+    return np.random.default_rng([problem['seed'], start]).random((size, d))
+
+# Problem and histogram ranges of the current process, set once per pool worker
+_shared = {}
+
+def _init_worker(problem, ranges):
+    _shared.update(problem=problem, ranges=ranges)
+
+def _run_chunk(start, size):
+    """
+    Evaluates samples start:start + size and returns their partial statistics.
+    """
+    problem, ranges = _shared['problem'], _shared['ranges']
+    return _chunk_statistics(problem, ranges, *_evaluate(problem, _uniforms(problem, start, size)))
+
+def _chunk_statistics(problem, ranges, capacitance, sensitivity):
+    result = {}
+    for name, values in (('capacitance', capacitance), ('sensitivity', sensitivity)):
+        result[name] = RunningStats(*ranges[name])
+        result[name].add(values)
+    within = np.abs(sensitivity / problem['nominal_sensitivity'] - 1) <= problem['sensitivity_tolerance']
+    if problem['capacitance_tolerance'] is not None:
+        within &= np.abs(capacitance / problem['nominal_capacitance'] - 1) <= problem['capacitance_tolerance']
+    result['passed'] = int(within.sum())
+    return result
+
+def run_tolerance_analysis(shape, boundary_condition, distributions, pressure_range, material_name=None,
+                           sensitivity_tolerance=0.05, capacitance_tolerance=None, n_samples=10**6,
+                           sampler='random', seed=None, rel_ci=None, yield_ci=None, confidence=0.95,
+                           chunk_size=DEFAULT_CHUNK_SIZE, n_workers=None, modes=None, n_quad=None):
+    """
+    Monte Carlo analysis of manufacturing tolerances.
+
+    Samples are drawn in chunks, evaluated in vectorized form and folded into streaming
+    statistics, so memory does not grow with the number of samples. Chunks run on a
+    process pool, a wave of n_workers chunks at a time; after each wave the confidence
+    intervals are checked and the run stops early once they are narrow enough. The
+    intervals use the independent-sample formula, which is conservative for Sobol points.
+
+    Parameters:
+    - shape, boundary_condition: Plate type
+    - distributions: Dictionary giving, for any name in PARAMETERS, a fixed value or a
+                     distribution (see _draw); missing material properties come from
+                     material_name, and b is only used for rectangular plates
+    - pressure_range: (p_min, p_max) (Pa); capacitance is reported at p_min and the
+                      sensitivity is (C(p_max) - C(p_min)) / (p_max - p_min)
+    - material_name: Material supplying the nominal young_mod, poisson_rat and dielectric_K
+    - sensitivity_tolerance: A part passes when its sensitivity is within this fraction of nominal
+    - capacitance_tolerance: Optional fraction of nominal capacitance also required to pass
+    - n_samples: Maximum number of samples
+    - sampler: 'random' or 'sobol' (scrambled quasi-random points)
+    - seed: Random seed
+    - rel_ci: Stop once the mean's confidence half-width is below this fraction of the
+              mean for both outputs
+    - yield_ci: Stop once the yield's confidence half-width is below this value
+    - confidence: Confidence level of the intervals
+    - chunk_size: Samples per chunk; rounded up to a power of two for the Sobol sampler
+    - n_workers: Number of worker processes, defaults to the CPU count; 1 runs in-process
+    - modes, n_quad: Options of the batched evaluation (see capacitance_factor)
+
+    Returns:
+    - Dictionary with 'samples', 'stopped_early', 'nominal', 'yield' (fraction and
+      ci_halfwidth) and, for 'capacitance' and 'sensitivity', the summary statistics
+      (mean, std, ci_halfwidth, min, max, quantiles, histogram)
+    """
+    b_spec = distributions.get('b')
+    _validate_design(shape, boundary_condition, None if b_spec is None else 1.0)
+    if shape == 'custom':
+        raise ValueError("Tolerance analysis supports circular and rectangular plates")
+    if sampler not in ('random', 'sobol'):
+        raise ValueError("Sampler must be either 'random' or 'sobol'")
+    if chunk_size < 1:
+        raise ValueError("Chunk size must be at least 1")
+    if sampler == 'sobol':
+        chunk_size = 1 << (int(chunk_size) - 1).bit_length()
+    unknown = set(distributions) - set(PARAMETERS)
+    if unknown:
+        raise ValueError(f"Unknown tolerance parameter {sorted(unknown)[0]}")
+
+    distributions = dict(distributions)
+    if shape != 'rectangular':
+        distributions.pop('b', None)
+    if material_name is not None:
+        material = Material.get_material(material_name)
+        if material is None:
+            raise ValueError(f"Material {material_name} not found!")
+        for name in ('young_mod', 'poisson_rat', 'dielectric_K'):
+            distributions.setdefault(name, getattr(material, name))
+    required = [name for name in PARAMETERS if name != 'b' or shape == 'rectangular']
+    missing = [name for name in required if name not in distributions]
+    if missing:
+        raise ValueError(f"Tolerance inputs are missing: {', '.join(missing)}")
+
+    seed = int(np.random.SeedSequence(seed).generate_state(1)[0]) if seed is None else seed
+    problem = dict(shape=shape, boundary_condition=boundary_condition, distributions=distributions,
+                   random=[name for name in required if isinstance(distributions[name], dict)],
+                   pressure_range=tuple(pressure_range), options=dict(modes=modes, n_quad=n_quad),
+                   sampler=sampler, seed=seed, sensitivity_tolerance=sensitivity_tolerance,
+                   capacitance_tolerance=capacitance_tolerance)
+    if not problem['random']:
+        raise ValueError("At least one input needs a distribution")
+
+    # Nominal design: every input at its central value
+    nominal_c, nominal_s = _evaluate(dict(problem, random=[]), np.empty((1, 0)))
+    problem.update(nominal_capacitance=float(nominal_c[0]), nominal_sensitivity=float(nominal_s[0]))
+
+    # The first chunk is evaluated here as a pilot that fixes the histogram ranges shared
+    # by every chunk, and is then folded in like the others
+    pilot_c, pilot_s = _evaluate(problem, _uniforms(problem, 0, min(chunk_size, n_samples)))
+    ranges = {}
+    for name, values in (('capacitance', pilot_c), ('sensitivity', pilot_s)):
+        finite = values[np.isfinite(values)]
+        if finite.size == 0:
+            raise ValueError("Every pilot sample touches down; narrow the distributions or the pressure range")
+        low, high = np.quantile(finite, [0.0005, 0.9995])
+        margin = (high - low) * 0.25 or abs(high) * 1e-6 or 1e-30
+        ranges[name] = (low - margin, high + margin)
+
+    z = stats.norm.ppf(0.5 + confidence / 2)
+    if n_workers is None:
+        n_workers = os.cpu_count() or 1
+    totals = dict(capacitance=RunningStats(*ranges['capacitance']), sensitivity=RunningStats(*ranges['sensitivity']),
+                  passed=0)
+    starts = list(range(chunk_size, n_samples, chunk_size))
+    stopped_early = False
+
+    def fold(result):
+        totals['capacitance'].merge(result['capacitance'])
+        totals['sensitivity'].merge(result['sensitivity'])
+        totals['passed'] += result['passed']
+
+    def converged():
+        n = done
+        p = totals['passed'] / n
+        checks = []
+        if rel_ci is not None:
+            checks += [totals[name].confidence_halfwidth(z) <= rel_ci * abs(totals[name].mean)
+                       for name in ('capacitance', 'sensitivity')]
+        if yield_ci is not None:
+            # Wilson-style floor keeps a yield of exactly 0 or 1 from looking certain too early
+            checks.append(z * np.sqrt(max(p * (1 - p), 1 / n) / n) <= yield_ci)
+        return bool(checks) and all(checks)
+
+    fold(_chunk_statistics(problem, ranges, pilot_c, pilot_s))
+    done = pilot_c.size
+    pool = (ProcessPoolExecutor(n_workers, initializer=_init_worker, initargs=(problem, ranges))
+            if n_workers > 1 and starts else None)
+    try:
+        if pool is None:
+            _init_worker(problem, ranges)
+        for wave in range(0, len(starts), n_workers):
+            sizes = [(start, min(chunk_size, n_samples - start)) for start in starts[wave:wave + n_workers]]
+            results = pool.map(_run_chunk, *zip(*sizes)) if pool else [_run_chunk(*s) for s in sizes]
+            for result in results:
+                fold(result)
+            done += sum(size for _, size in sizes)
+            if done < n_samples and converged():
+                stopped_early = True
+                break
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+
+    p = totals['passed'] / done
+    return dict(samples=done, stopped_early=stopped_early, sampler=sampler,
+                nominal=dict(capacitance=problem['nominal_capacitance'], sensitivity=problem['nominal_sensitivity']),
+                capacitance=totals['capacitance'].summary(z), sensitivity=totals['sensitivity'].summary(z),
+                **{'yield': dict(fraction=p, ci_halfwidth=z * np.sqrt(max(p * (1 - p), 1 / done) / done))})
+
+def format_report(result):
+    """
+    Formats the result of run_tolerance_analysis as a short text table.
+    """
+    lines = [f"{result['samples']} {result['sampler']} samples" + (" (stopped early)" if result['stopped_early'] else ""),
+             f"{'output':<12} {'nominal':>11} {'mean':>11} {'std':>11} {'p1':>11} {'p99':>11}"]
+    for name in ('capacitance', 'sensitivity'):
+        s = result[name]
+        lines.append(f"{name:<12} {result['nominal'][name]:>11.4e} {s['mean']:>11.4e} {s['std']:>11.4e} "
+                     f"{s['quantiles'][0.01]:>11.4e} {s['quantiles'][0.99]:>11.4e}")
+    touched = result['capacitance']['nonfinite']
+    if touched:
+        lines.append(f"{touched} samples touch down")
+    fraction, ci = result['yield']['fraction'], result['yield']['ci_halfwidth']
+    lines.append(f"yield {100 * fraction:.2f}% +/- {100 * ci:.2f}%")
+    return '\n'.join(lines)
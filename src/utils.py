@@ -0,0 +1,12 @@
+import os
+
+# Directory for generated results, caches and reports
+OUTPUT_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'output')
+
+def output_path(*parts):
+    """
+    Returns a path inside the output directory, creating its parent directories.
+    """
+    path = os.path.join(OUTPUT_DIR, *parts)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    return path